@@ -1,30 +1,100 @@
 # app.py
 import os
-import shutil
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import pandas as pd
-import tempfile
+from contextlib import asynccontextmanager
 
 # Import modules
 from gemini_helpers import (
     process_document_image,
     analyze_ledger_data,
+    analyze_ledger_stream,
     verify_medication,
-    generate_journey_visualization
+    verify_medication_stream,
+    verify_medications_batch,
+    narrate_journey,
+    narrate_journey_stream,
+    get_llm_cache_stats,
+    get_llm_usage_stats
 )
+from config import (
+    VERIFY_BATCH_SIZE,
+    VERIFY_BATCH_CONCURRENCY,
+    GEOCODE_CACHE_PATH,
+    GAZETTEER_PATH,
+    CUSTODY_MAX_GAP_DAYS,
+    JOURNEY_MAX_SPEED_KMH,
+    LEDGER_CHUNK_ROWS,
+    VERIFY_ONCHAIN_TIMEOUT_SECONDS,
+    VERIFY_HISTORY_TIMEOUT_SECONDS,
+    VERIFY_ROLES_TIMEOUT_SECONDS,
+    VERIFY_MODEL_TIMEOUT_SECONDS,
+    BATCH_JOBS_PATH,
+    BATCH_WORKERS,
+    BATCH_INGEST_CHUNK_ROWS,
+    BATCH_WINDOW_RETRIES,
+    BATCH_RETRY_DELAY_SECONDS,
+    FAST_JSON_RESPONSES,
+    RESPONSE_COMPRESSION_MIN_BYTES,
+    RESPONSE_GZIP_LEVEL,
+    RESPONSE_BROTLI_QUALITY
+)
+from journey_metrics import GeocodeCache, compute_journey
+from ledger_pipeline import read_ledger_chunks
+from batch_jobs import JobStore, BatchJobEngine
+from batch_ingest import open_batch_rows, BatchFileError
+from single_flight import SingleFlight
+from response_encoding import ResponseEncoder
+from event_index import HISTORY_FIELDS, encode_cursor, decode_cursor
 from blockchain import (
     get_medication_history,
+    get_medication_history_page,
     record_transfer,
     register_medication,
-    verify_on_chain
+    submit_transfer,
+    submit_registration,
+    get_transaction_status,
+    verify_on_chain,
+    verify_on_chain_many,
+    get_cache_stats,
+    get_address_roles,
+    start_blockchain_services,
+    stop_blockchain_services
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Share one pooled RPC session and keep the local Transfer index in sync
+    await start_blockchain_services()
+    # Resume batch jobs left queued, running or paused by a previous process
+    batch_engine.start()
+    yield
+    await batch_engine.stop()
+    await stop_blockchain_services()
+    batch_jobs.close()
+    geocoder.close()
+
+# In-flight /api/verify-medication computations, keyed by request body
+verification_flights = SingleFlight()
+
+# Direct JSON encoding and compression for responses carrying full histories
+encoder = ResponseEncoder(
+    fast_json=FAST_JSON_RESPONSES,
+    min_bytes=RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=RESPONSE_GZIP_LEVEL,
+    brotli_quality=RESPONSE_BROTLI_QUALITY
 )
 
+# Offline geocoding for journey maps
+geocoder = GeocodeCache(GEOCODE_CACHE_PATH, GAZETTEER_PATH)
+
 # Create FastAPI app
-app = FastAPI(title="Pharmaceutical Authentication API")
+app = FastAPI(title="Pharmaceutical Authentication API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -40,6 +110,7 @@ class MedicationVerifyRequest(BaseModel):
     lotNumber: str
     ndc: str
     scannedData: Optional[dict] = None
+    deep: bool = False  # Ask Gemini even when the local custody rules are conclusive
 
 class TransferRequest(BaseModel):
     from_address: str
@@ -69,21 +140,9 @@ async def process_document(file: UploadFile = File(...)):
     Process an uploaded document image to extract pharmaceutical data
     """
     try:
-        # Save the uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
-        try:
-            shutil.copyfileobj(file.file, temp_file)
-        finally:
-            temp_file.close()
-            file.file.close()
-        
-        # Process the document with Gemini
-        result = await process_document_image(temp_file.name)
-        
-        # Delete the temporary file
-        os.unlink(temp_file.name)
-        
-        return result
+        # Hand the upload's bytes straight to the model request
+        content = await file.read()
+        return await process_document_image(content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,8 +150,14 @@ async def process_document(file: UploadFile = File(...)):
 async def analyze_ledger(file: UploadFile = File(...)):
     """
     Analyze an uploaded ledger file
+    
+    CSV ledgers are streamed in chunks through the map-reduce pipeline; other
+    formats are sent to Gemini whole.
     """
     try:
+        if (file.filename or "").lower().endswith(".csv"):
+            return await analyze_ledger_stream(read_ledger_chunks(file.file, LEDGER_CHUNK_ROWS))
+        
         # Read the file content
         content = await file.read()
         content_str = content.decode("utf-8")
@@ -105,49 +170,256 @@ async def analyze_ledger(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/verify-medication")
-async def verify_medication_endpoint(request: MedicationVerifyRequest):
+async def verify_medication_endpoint(request: MedicationVerifyRequest, accept_encoding: Optional[str] = Header(None)):
     """
     Verify medication authenticity
+    
+    The response's `mode` says how far verification went:
+    - `unregistered`: the lot is not registered on-chain, so the custody
+      rules and Gemini are skipped and the product is reported as not
+      authentic
+    - `rules`: the local custody rules settled the result
+    - `model`: Gemini was consulted
+    
+    A stage that exceeds its timeout fails the request with 504. Large
+    responses are gzip- or brotli-compressed when the client accepts it.
     """
     try:
-        # Get blockchain history
-        blockchain_data = await get_medication_history(request.lotNumber)
-        
-        # First check on-chain verification
-        onchain_verification = await verify_on_chain(request.lotNumber)
-        
-        # Use Gemini for enhanced verification
-        gemini_verification = await verify_medication({
-            "lotNumber": request.lotNumber,
-            "ndc": request.ndc,
-            **(request.scannedData or {})
-        }, blockchain_data)
-        
-        # Combine results
-        return {
-            "blockchainVerification": onchain_verification,
-            "enhancedVerification": gemini_verification,
-            "isAuthentic": onchain_verification["isAuthentic"] and gemini_verification.get("isAuthentic", False),
-            "history": blockchain_data
-        }
+        # Concurrent identical scans share one verification
+        key = json.dumps(
+            [request.lotNumber, request.ndc, request.scannedData, request.deep],
+            sort_keys=True,
+            default=str
+        )
+        result = await verification_flights.do(key, _verify_medication, request)
+        return await encoder.response(result, accept_encoding)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stage(name, awaitable, timeout):
+    """
+    Await one verification stage, turning a timeout into a 504
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{name} timed out after {timeout:g}s")
+
+def _discard(task):
+    # Cancel a task whose result is no longer needed without leaving its
+    # exception unretrieved
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+def _unregistered_result(onchain_verification):
+    """
+    Response for a lot the contract has no registration for
+    """
+    return {
+        "mode": "unregistered",
+        "blockchainVerification": onchain_verification,
+        "enhancedVerification": {
+            "isAuthentic": False,
+            "authenticityScore": 0.0,
+            "issues": ["Lot number is not registered on-chain"],
+            "recommendations": ["Quarantine the product and report it to the manufacturer"],
+            "source": "onchain"
+        },
+        "isAuthentic": False,
+        "history": []
+    }
+
+def _verification_result(onchain_verification, gemini_verification, blockchain_data):
+    """
+    Combine on-chain and rule/Gemini verification into the endpoint response
+    """
+    return {
+        "mode": "rules" if gemini_verification.get("source") == "rules" else "model",
+        "blockchainVerification": onchain_verification,
+        "enhancedVerification": gemini_verification,
+        "isAuthentic": onchain_verification["isAuthentic"] and gemini_verification.get("isAuthentic", False),
+        "history": blockchain_data
+    }
+
+async def _verify_medication(request):
+    """
+    Combine on-chain and Gemini verification for one medication
+    
+    The history lookup runs concurrently with the on-chain check and is
+    abandoned if the lot turns out not to be registered.
+    
+    Args:
+        request: MedicationVerifyRequest to verify
+    """
+    history_task = asyncio.create_task(_stage(
+        "History lookup", get_medication_history(request.lotNumber), VERIFY_HISTORY_TIMEOUT_SECONDS
+    ))
+    try:
+        onchain_verification = await _stage(
+            "On-chain verification", verify_on_chain(request.lotNumber), VERIFY_ONCHAIN_TIMEOUT_SECONDS
+        )
+        if not onchain_verification.get("registered", True):
+            return _unregistered_result(onchain_verification)
+        
+        blockchain_data = await history_task
+    finally:
+        if not history_task.done():
+            _discard(history_task)
+    
+    # Resolve party roles so the custody rules can check each hop
+    roles = await _stage("Role lookup", get_address_roles(
+        [transfer["from"] for transfer in blockchain_data] + [transfer["to"] for transfer in blockchain_data]
+    ), VERIFY_ROLES_TIMEOUT_SECONDS)
+    
+    # Local custody rules, escalating to Gemini only when they are inconclusive
+    gemini_verification = await _stage("Model verification", verify_medication({
+        "lotNumber": request.lotNumber,
+        "ndc": request.ndc,
+        **(request.scannedData or {})
+    }, blockchain_data, roles, deep=request.deep), VERIFY_MODEL_TIMEOUT_SECONDS)
+    
+    return _verification_result(onchain_verification, gemini_verification, blockchain_data)
+
+def _sse(event, data):
+    """
+    Format one server-sent event with a JSON payload
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/verify-medication/stream")
+async def verify_medication_stream_endpoint(request: MedicationVerifyRequest):
+    """
+    Verify medication authenticity, streaming results as server-sent events
+    
+    Events arrive in this order: `onchain` as soon as the contract lookup
+    returns, `history`, `rules`, then `delta` chunks while Gemini writes
+    (only when it is consulted), `verification`, and a final `result` with
+    the same body as /api/verify-medication. An unregistered lot goes
+    straight from `onchain` to `result`. Failures and stage timeouts end
+    the stream with an `error` event.
+    """
+    async def events():
+        history_task = asyncio.create_task(_stage(
+            "History lookup", get_medication_history(request.lotNumber), VERIFY_HISTORY_TIMEOUT_SECONDS
+        ))
+        try:
+            onchain_verification = await _stage(
+                "On-chain verification", verify_on_chain(request.lotNumber), VERIFY_ONCHAIN_TIMEOUT_SECONDS
+            )
+            yield _sse("onchain", onchain_verification)
+            if not onchain_verification.get("registered", True):
+                yield _sse("result", _unregistered_result(onchain_verification))
+                return
+            
+            blockchain_data = await history_task
+            yield _sse("history", blockchain_data)
+            
+            roles = await _stage("Role lookup", get_address_roles(
+                [transfer["from"] for transfer in blockchain_data] + [transfer["to"] for transfer in blockchain_data]
+            ), VERIFY_ROLES_TIMEOUT_SECONDS)
+            gemini_verification = {}
+            async for event, data in verify_medication_stream({
+                "lotNumber": request.lotNumber,
+                "ndc": request.ndc,
+                **(request.scannedData or {})
+            }, blockchain_data, roles, deep=request.deep):
+                if event == "result":
+                    gemini_verification = data
+                    event = "verification"
+                yield _sse(event, data)
+            
+            yield _sse("result", _verification_result(onchain_verification, gemini_verification, blockchain_data))
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            if not history_task.done():
+                _discard(history_task)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/api/medication-history/{lot_number}")
-async def medication_history(lot_number: str):
+async def medication_history(
+    lot_number: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    order: str = "asc",
+    fields: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None)
+):
     """
     Get medication transfer history
+    
+    Transfers are ordered by (blockNumber, logIndex), newest first with
+    `order=desc`. `fields` is a comma-separated subset of the entry fields,
+    e.g. `fields=blockNumber,to`. Without `cursor` or `limit` the whole
+    history is returned as a list. With either, one page is returned as
+    `{"lotNumber", "order", "transfers", "nextCursor"}`; pass `nextCursor`
+    back as `cursor` for the following page. It is null on the last page.
+    
+    Large responses are gzip- or brotli-compressed when the client accepts it.
     """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    
+    selected = None
+    if fields is not None:
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in selected if field not in HISTORY_FIELDS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(HISTORY_FIELDS)}"
+            )
+    
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        history = await get_medication_history(lot_number)
-        return history
+        if cursor is None and limit is None and selected is None and order == "asc":
+            # The full history is served from the read-through cache
+            history = await get_medication_history(lot_number)
+            return await encoder.response(history, accept_encoding)
+        
+        transfers, next_position = await get_medication_history_page(lot_number, after, order, limit, selected)
+        if cursor is None and limit is None:
+            return await encoder.response(transfers, accept_encoding)
+        return await encoder.response({
+            "lotNumber": lot_number,
+            "order": order,
+            "transfers": transfers,
+            "nextCursor": encode_cursor(next_position) if next_position is not None else None
+        }, accept_encoding)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """
+    Get hit/miss counters for the chain read caches and the Gemini response
+    cache, plus per-helper Gemini token usage and coalesced verifications
+    """
+    return {
+        **get_cache_stats(),
+        "llm": get_llm_cache_stats(),
+        "llmUsage": get_llm_usage_stats(),
+        "verifications": verification_flights.stats()
+    }
+
 @app.post("/api/record-transfer")
-async def record_transfer_endpoint(request: TransferRequest):
+async def record_transfer_endpoint(request: TransferRequest, wait: bool = True):
     """
     Record a medication transfer on the blockchain
+
+    With `wait=false` the transaction is only submitted; the endpoint returns
+    202 with its hash and a job id, and progress is polled via /api/tx/{hash or jobId}.
     """
     try:
         # Transform the request to match blockchain function
@@ -162,6 +434,10 @@ async def record_transfer_endpoint(request: TransferRequest):
             "location": request.location
         }
         
+        if not wait:
+            submission = await submit_transfer(transfer_data)
+            return JSONResponse(status_code=202, content=submission)
+        
         # Record on blockchain
         result = await record_transfer(transfer_data)
         
@@ -170,9 +446,12 @@ async def record_transfer_endpoint(request: TransferRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/register-medication")
-async def register_medication_endpoint(request: RegisterMedicationRequest):
+async def register_medication_endpoint(request: RegisterMedicationRequest, wait: bool = True):
     """
     Register a new medication on the blockchain
+
+    With `wait=false` the transaction is only submitted; the endpoint returns
+    202 with its hash and a job id, and progress is polled via /api/tx/{hash or jobId}.
     """
     try:
         # Transform the request to match blockchain function
@@ -186,6 +465,10 @@ async def register_medication_endpoint(request: RegisterMedicationRequest):
             "expirationDate": request.expirationDate
         }
         
+        if not wait:
+            submission = await submit_registration(medication_data)
+            return JSONResponse(status_code=202, content=submission)
+        
         # Register on blockchain
         result = await register_medication(medication_data)
         
@@ -193,97 +476,236 @@ async def register_medication_endpoint(request: RegisterMedicationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/tx/{tx_id}")
+async def transaction_status(tx_id: str):
+    """
+    Get the status of a submitted transaction: pending, mined or failed,
+    with gas used and the current confirmation count
+    
+    `tx_id` is the transaction hash or the `jobId` returned with a `202`.
+    """
+    try:
+        status = await get_transaction_status(tx_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if status is None:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return status
+
 @app.get("/api/journey-map/{lot_number}")
-async def journey_map(lot_number: str):
+async def journey_map(lot_number: str, narrate: bool = False):
     """
     Generate a visualization map for a medication's journey
+    
+    Transit times, distances and risk scores are computed locally; with
+    `narrate=true` a Gemini-written summary is added under `narrative`.
     """
     try:
         # Get blockchain history
         blockchain_data = await get_medication_history(lot_number)
         
-        # Use Gemini to generate visualization data
-        result = await generate_journey_visualization(blockchain_data)
+        result = compute_journey(
+            blockchain_data,
+            geocoder,
+            max_gap_days=CUSTODY_MAX_GAP_DAYS,
+            max_speed_kmh=JOURNEY_MAX_SPEED_KMH
+        )
+        
+        if narrate:
+            result["narrative"] = await narrate_journey(result)
         
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/journey-map/{lot_number}/stream")
+async def journey_map_stream(lot_number: str, narrate: bool = False):
+    """
+    Journey map as server-sent events
+    
+    Sends `history`, then the locally computed `journey`, then, with
+    `narrate=true`, `delta` chunks of the Gemini narration followed by
+    `narrative`. Failures end the stream with an `error` event.
+    """
+    async def events():
+        try:
+            blockchain_data = await get_medication_history(lot_number)
+            yield _sse("history", blockchain_data)
+            
+            result = compute_journey(
+                blockchain_data,
+                geocoder,
+                max_gap_days=CUSTODY_MAX_GAP_DAYS,
+                max_speed_kmh=JOURNEY_MAX_SPEED_KMH
+            )
+            yield _sse("journey", result)
+            
+            if narrate:
+                async for event, data in narrate_journey_stream(result):
+                    yield _sse("narrative" if event == "result" else event, data)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/api/batch-process")
-async def batch_process(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def batch_process(file: UploadFile = File(...)):
     """
     Process a batch file (CSV or Excel) of medications for bulk verification
+    
+    The rows are stored as a new job and verified by the batch worker pool;
+    poll /api/batch/{job_id} for progress and /api/batch/{job_id}/results
+    for the per-row results.
     """
     try:
-        # Save the uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1])
         try:
-            shutil.copyfileobj(file.file, temp_file)
+            # Validate the header, then stream the rows straight from the upload
+            rows = open_batch_rows(
+                file.file,
+                os.path.splitext(file.filename)[1].lower(),
+                BATCH_INGEST_CHUNK_ROWS
+            )
+            
+            # Persist the rows as a job; the worker pool picks it up from the queue
+            job = await batch_engine.submit(file.filename, rows)
+        except BatchFileError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         finally:
-            temp_file.close()
             file.file.close()
         
-        # Read the file based on extension
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext == '.csv':
-            df = pd.read_csv(temp_file.name)
-        elif file_ext in ['.xlsx', '.xls']:
-            df = pd.read_excel(temp_file.name)
-        else:
-            os.unlink(temp_file.name)
-            raise HTTPException(status_code=400, detail="Unsupported file format")
-        
-        # Check for required columns
-        required_columns = ['lotNumber', 'ndc']
-        if not all(col in df.columns for col in required_columns):
-            os.unlink(temp_file.name)
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Missing required columns. File must contain: {', '.join(required_columns)}"
-            )
-        
-        # Process in background
-        background_tasks.add_task(process_batch, df, temp_file.name)
-        
-        return {"message": "Batch processing started", "total_records": len(df)}
+        return JSONResponse(status_code=202, content={
+            "message": "Batch processing started",
+            "jobId": job["jobId"],
+            "total_records": job["totalRows"]
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_batch(df, temp_file):
+@app.get("/api/batch/{job_id}")
+async def batch_status(job_id: str):
+    """
+    Get a batch job's status and progress
+    """
+    job = batch_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+@app.get("/api/batch/{job_id}/results")
+async def batch_results(job_id: str, offset: int = 0, limit: int = 1000):
     """
-    Background task to process a batch of medications
+    Get the results of a batch job's processed rows, in input order
+    """
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    
+    job = batch_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return {
+        "jobId": job_id,
+        "status": job["status"],
+        "offset": offset,
+        "results": batch_jobs.get_results(job_id, offset, min(limit, 10000))
+    }
+
+@app.post("/api/batch/{job_id}/resume")
+async def batch_resume(job_id: str):
+    """
+    Queue a batch job that was paused after repeated failures
+    
+    Processing continues from its first pending row.
     """
     try:
-        results = []
-        for idx, row in df.iterrows():
-            try:
-                # Verify each medication
-                verification = await verify_medication_endpoint(
-                    MedicationVerifyRequest(
-                        lotNumber=row['lotNumber'],
-                        ndc=row['ndc']
-                    )
-                )
-                results.append({
-                    "lotNumber": row['lotNumber'],
-                    "ndc": row['ndc'],
-                    "isAuthentic": verification["isAuthentic"],
-                    "authenticityScore": verification["enhancedVerification"].get("authenticityScore", 0)
-                })
-            except Exception as e:
-                results.append({
-                    "lotNumber": row['lotNumber'],
-                    "ndc": row['ndc'],
-                    "error": str(e)
-                })
+        job = batch_engine.resume(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+async def _verify_batch_rows(rows):
+    """
+    Verify one window of batch rows, looking up on-chain state in bulk and
+    packing the Gemini verifications of many lots into shared requests
+    
+    Args:
+        rows: List of distinct (lotNumber, ndc) tuples
         
-        # Save results to a CSV file
-        result_df = pd.DataFrame(results)
-        result_df.to_csv('batch_results.csv', index=False)
-    finally:
-        # Delete the temporary file
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
+    Returns:
+        list: One result record per row
+    """
+    lots = [str(lot) for lot, _ in rows]
+    
+    # Look up each distinct lot once, in batched round trips
+    distinct_lots = list(dict.fromkeys(lots))
+    onchain_by_lot = dict(zip(distinct_lots, await verify_on_chain_many(distinct_lots)))
+    history_by_lot = dict(zip(distinct_lots, await asyncio.gather(
+        *(get_medication_history(lot) for lot in distinct_lots),
+        return_exceptions=True
+    )))
+    onchain_results = [onchain_by_lot[lot] for lot in lots]
+    histories = [history_by_lot[lot] for lot in lots]
+    
+    # One role lookup for every party in the window
+    roles = await get_address_roles([
+        address
+        for history in history_by_lot.values() if not isinstance(history, Exception)
+        for transfer in history
+        for address in (transfer["from"], transfer["to"])
+    ])
+    
+    to_verify = [
+        i for i, (onchain, history) in enumerate(zip(onchain_results, histories))
+        if not isinstance(onchain, Exception) and not isinstance(history, Exception)
+        # Unregistered lots are settled without the custody rules or Gemini
+        and onchain.get("registered", True)
+    ]
+    verifications = dict(zip(to_verify, await verify_medications_batch([
+        ({"lotNumber": lots[i], "ndc": rows[i][1]}, histories[i], roles)
+        for i in to_verify
+    ])))
+    
+    return [
+        _batch_row_result(row, onchain_results[i], histories[i], verifications.get(i))
+        for i, row in enumerate(rows)
+    ]
+
+def _batch_row_result(row, onchain_verification, history, verification):
+    """
+    Build the output record for one batch row
+    """
+    lot_number, ndc = row
+    for failure in (onchain_verification, history):
+        if isinstance(failure, Exception):
+            return {"lotNumber": lot_number, "ndc": ndc, "error": str(failure)}
+    if verification is None:
+        verification = _unregistered_result(onchain_verification)["enhancedVerification"]
+    if "error" in verification:
+        return {"lotNumber": lot_number, "ndc": ndc, "error": verification["error"]}
+    return {
+        "lotNumber": lot_number,
+        "ndc": ndc,
+        "isAuthentic": onchain_verification["isAuthentic"] and verification.get("isAuthentic", False),
+        "authenticityScore": verification.get("authenticityScore", 0)
+    }
+
+# Persisted batch jobs, processed a window at a time by a bounded worker pool
+batch_jobs = JobStore(BATCH_JOBS_PATH)
+batch_engine = BatchJobEngine(
+    batch_jobs,
+    _verify_batch_rows,
+    concurrency=BATCH_WORKERS,
+    # Enough rows per window to keep every concurrent RPC batch busy
+    chunk_rows=VERIFY_BATCH_SIZE * VERIFY_BATCH_CONCURRENCY,
+    retries=BATCH_WINDOW_RETRIES,
+    retry_delay=BATCH_RETRY_DELAY_SECONDS
+)
 
 if __name__ == "__main__":
     import uvicorn
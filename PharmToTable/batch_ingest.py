@@ -0,0 +1,103 @@
+# batch_ingest.py
+import pandas as pd
+
+REQUIRED_COLUMNS = ("lotNumber", "ndc")
+
+class BatchFileError(ValueError):
+    """
+    The uploaded batch file cannot be processed (format or columns)
+    """
+
+def _check_columns(columns):
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise BatchFileError(f"Missing required columns. File must contain: {', '.join(REQUIRED_COLUMNS)}")
+    return [list(columns).index(column) for column in REQUIRED_COLUMNS]
+
+def _clean(value):
+    if value is None:
+        return ""
+    return str(value).strip()
+
+def _csv_rows(source, chunk_rows):
+    reader = pd.read_csv(
+        source,
+        usecols=list(REQUIRED_COLUMNS),
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_rows
+    )
+    with reader:
+        try:
+            for chunk in reader:
+                for lot_number, ndc in zip(chunk["lotNumber"], chunk["ndc"]):
+                    lot_number, ndc = lot_number.strip(), ndc.strip()
+                    if lot_number or ndc:
+                        yield lot_number, ndc
+        except pd.errors.ParserError as e:
+            raise BatchFileError(f"Malformed CSV: {e}")
+
+def _xlsx_rows(workbook, rows, lot_index, ndc_index):
+    try:
+        for row in rows:
+            lot_number = _clean(row[lot_index] if lot_index < len(row) else None)
+            ndc = _clean(row[ndc_index] if ndc_index < len(row) else None)
+            if lot_number or ndc:
+                yield lot_number, ndc
+    finally:
+        workbook.close()
+
+def _xls_rows(source):
+    # Legacy .xls has no streaming reader; only the two columns are loaded
+    df = pd.read_excel(source, usecols=list(REQUIRED_COLUMNS), dtype=str).fillna("")
+    for lot_number, ndc in zip(df["lotNumber"], df["ndc"]):
+        lot_number, ndc = lot_number.strip(), ndc.strip()
+        if lot_number or ndc:
+            yield lot_number, ndc
+
+def open_batch_rows(source, file_ext, chunk_rows=50000):
+    """
+    Validate a batch file's header and stream its (lotNumber, ndc) rows
+
+    CSV is parsed in fixed-size chunks and .xlsx through openpyxl's
+    read-only mode, so memory stays flat however many rows the file has.
+    Only the `lotNumber` and `ndc` columns are parsed, and blank rows are
+    skipped. The header is checked before this returns; the rows are read
+    as the generator is consumed.
+
+    Args:
+        source: Seekable binary file object or path
+        file_ext: Lower-case file extension, e.g. ".csv"
+        chunk_rows: Rows per CSV chunk
+
+    Returns:
+        generator: (lotNumber, ndc) string pairs
+
+    Raises:
+        BatchFileError: Unsupported format or missing required columns
+    """
+    if file_ext == ".csv":
+        _check_columns(pd.read_csv(source, nrows=0).columns)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return _csv_rows(source, chunk_rows)
+
+    if file_ext == ".xlsx":
+        from openpyxl import load_workbook
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = [_clean(value) for value in next(rows, ())]
+            lot_index, ndc_index = _check_columns(header)
+        except BatchFileError:
+            workbook.close()
+            raise
+        return _xlsx_rows(workbook, rows, lot_index, ndc_index)
+
+    if file_ext == ".xls":
+        _check_columns(pd.read_excel(source, nrows=0).columns)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return _xls_rows(source)
+
+    raise BatchFileError("Unsupported file format")
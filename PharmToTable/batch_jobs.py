@@ -0,0 +1,357 @@
+# batch_jobs.py
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from itertools import islice
+from rate_limiter import background_work
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    status TEXT NOT NULL,
+    total_rows INTEGER NOT NULL DEFAULT 0,
+    processed_rows INTEGER NOT NULL DEFAULT 0,
+    error_rows INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_rows (
+    job_id TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    lot_number TEXT NOT NULL,
+    ndc TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS job_rows_pending ON job_rows (job_id, status, row_index);
+CREATE INDEX IF NOT EXISTS job_rows_by_item ON job_rows (job_id, lot_number, ndc, status);
+"""
+
+# Job states; rows are "pending", "done" or "error"
+QUEUED = "queued"
+INGESTING = "ingesting"
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Rows inserted per transaction while a job is created
+INSERT_CHUNK_ROWS = 10000
+
+class JobStore:
+    """
+    SQLite-backed batch jobs with one status and result per input row
+
+    Every job's rows and results live under its own id, so concurrent jobs
+    never share output, and pending rows survive a restart. `add_rows` runs
+    on a worker thread with its own connection; with WAL, the event loop's
+    reads never wait for an ingestion transaction.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = self._connect()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_job(self, job_id, filename):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, filename, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, filename, INGESTING, now, now)
+            )
+
+    def add_rows(self, job_id, rows):
+        """
+        Append (lotNumber, ndc) rows to a job in bounded transactions
+
+        Meant to run on a worker thread; it uses a connection of its own.
+
+        Returns:
+            int: Number of rows added
+        """
+        rows = iter(rows)
+        total = 0
+        conn = self._connect()
+        try:
+            while True:
+                chunk = [
+                    (job_id, total + offset, str(lot), str(ndc), "pending")
+                    for offset, (lot, ndc) in enumerate(islice(rows, INSERT_CHUNK_ROWS))
+                ]
+                if not chunk:
+                    return total
+                with conn:
+                    conn.executemany(
+                        "INSERT INTO job_rows (job_id, row_index, lot_number, ndc, status) VALUES (?, ?, ?, ?, ?)",
+                        chunk
+                    )
+                    conn.execute(
+                        "UPDATE jobs SET total_rows = total_rows + ?, updated_at = ? WHERE id = ?",
+                        (len(chunk), time.time(), job_id)
+                    )
+                total += len(chunk)
+        finally:
+            conn.close()
+
+    def set_status(self, job_id, status, error=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+
+    def pending_rows(self, job_id, limit):
+        """
+        Return up to `limit` unprocessed rows as (row_index, lotNumber, ndc)
+        """
+        return [
+            (row["row_index"], row["lot_number"], row["ndc"])
+            for row in self.conn.execute(
+                """
+                SELECT row_index, lot_number, ndc FROM job_rows
+                WHERE job_id = ? AND status = 'pending'
+                ORDER BY row_index LIMIT ?
+                """,
+                (job_id, limit)
+            )
+        ]
+
+    def save_results(self, job_id, results):
+        """
+        Store results for ((lotNumber, ndc), result dict) pairs and update the job's counters
+
+        Each result is written to every pending row of the job with the same
+        lotNumber and ndc, so duplicates later in the file are never
+        processed again.
+        """
+        processed = errors = 0
+        with self.conn:
+            for (lot_number, ndc), result in results:
+                status = "error" if "error" in result else "done"
+                updated = self.conn.execute(
+                    """
+                    UPDATE job_rows SET status = ?, result = ?
+                    WHERE job_id = ? AND lot_number = ? AND ndc = ? AND status = 'pending'
+                    """,
+                    (status, json.dumps(result, default=str), job_id, str(lot_number), str(ndc))
+                ).rowcount
+                processed += updated
+                if status == "error":
+                    errors += updated
+            self.conn.execute(
+                """
+                UPDATE jobs SET processed_rows = processed_rows + ?, error_rows = error_rows + ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (processed, errors, time.time(), job_id)
+            )
+
+    def unfinished_jobs(self):
+        """
+        Ids of jobs that were queued, running or paused, oldest first
+        """
+        return [
+            row["id"] for row in self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?, ?) ORDER BY created_at", (QUEUED, RUNNING, PAUSED)
+            )
+        ]
+
+    def fail_interrupted_ingestion(self):
+        # A job whose upload was still being ingested when the process
+        # stopped has an incomplete row set and cannot be resumed
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ?",
+            (FAILED, "Interrupted while ingesting the upload", time.time(), INGESTING)
+        )
+        self.conn.commit()
+
+    def get_job(self, job_id):
+        """
+        Return a job's status and progress, or None if the id is unknown
+        """
+        row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "jobId": row["id"],
+            "filename": row["filename"],
+            "status": row["status"],
+            "totalRows": row["total_rows"],
+            "processedRows": row["processed_rows"],
+            "errorRows": row["error_rows"],
+            "progress": row["processed_rows"] / row["total_rows"] if row["total_rows"] else 0.0,
+            "error": row["error"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"]
+        }
+
+    def get_results(self, job_id, offset=0, limit=1000):
+        """
+        Return processed row results in input order
+        """
+        return [
+            {"row": row["row_index"], **json.loads(row["result"])}
+            for row in self.conn.execute(
+                """
+                SELECT row_index, result FROM job_rows
+                WHERE job_id = ? AND status != 'pending'
+                ORDER BY row_index LIMIT ? OFFSET ?
+                """,
+                (job_id, limit, offset)
+            )
+        ]
+
+    def close(self):
+        self.conn.close()
+
+class BatchJobEngine:
+    """
+    Worker pool that runs persisted batch jobs
+
+    Jobs are processed `chunk_rows` rows at a time by `process_rows`, with
+    up to `concurrency` jobs in flight. Results are committed after every
+    chunk, so on restart queued and running jobs resume from their first
+    pending row. Repeated (lotNumber, ndc) pairs are processed once per job
+    and their result is copied to every duplicate.
+
+    A window whose `process_rows` call raises (e.g. a transient RPC error)
+    is retried up to `retries` times with exponential backoff. If it still
+    fails, the job is paused with the error recorded; `resume` queues it
+    again from that window, and paused jobs are also resumed on start.
+
+    Args:
+        store: JobStore holding jobs and rows
+        process_rows: Async callable taking a list of distinct
+            (lotNumber, ndc) tuples and returning one result dict per tuple
+        concurrency: Number of jobs processed at once
+        chunk_rows: Rows handed to `process_rows` per call
+        retries: Retries of a failed window before the job is set aside
+        retry_delay: Seconds before the first retry, doubled for each one
+    """
+
+    def __init__(self, store, process_rows, concurrency=2, chunk_rows=400, retries=3, retry_delay=2.0):
+        self.store = store
+        self.process_rows = process_rows
+        self.concurrency = concurrency
+        self.chunk_rows = chunk_rows
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = asyncio.Queue()
+        self._workers = []
+
+    async def submit(self, filename, rows):
+        """
+        Persist a job's rows and queue it
+
+        Args:
+            filename: Name of the uploaded file, for reference
+            rows: Iterable of (lotNumber, ndc); consumed on a worker thread
+
+        Returns:
+            dict: Job status after ingestion
+        """
+        job_id = uuid.uuid4().hex
+        self.store.create_job(job_id, filename)
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.store.add_rows, job_id, rows)
+        except Exception as e:
+            self.store.set_status(job_id, FAILED, str(e))
+            raise
+        self.store.set_status(job_id, QUEUED)
+        self._queue.put_nowait(job_id)
+        return self.store.get_job(job_id)
+
+    def resume(self, job_id):
+        """
+        Queue a paused job again from its first pending row
+
+        Returns:
+            dict: Job status, or None if the id is unknown
+
+        Raises:
+            ValueError: If the job is not paused
+        """
+        job = self.store.get_job(job_id)
+        if job is None:
+            return None
+        if job["status"] != PAUSED:
+            raise ValueError(f"Job is {job['status']}; only paused jobs can be resumed")
+        self.store.set_status(job_id, QUEUED)
+        self._queue.put_nowait(job_id)
+        return self.store.get_job(job_id)
+
+    async def _run_job(self, job_id):
+        self.store.set_status(job_id, RUNNING)
+        while True:
+            rows = self.store.pending_rows(job_id, self.chunk_rows)
+            if not rows:
+                break
+            # Each distinct (lotNumber, ndc) is verified once and fanned out to its duplicates
+            items = list(dict.fromkeys((lot, ndc) for _, lot, ndc in rows))
+            results = await self._process_window(job_id, items)
+            if results is None:
+                return
+            self.store.save_results(job_id, zip(items, results))
+        self.store.set_status(job_id, COMPLETED)
+
+    async def _process_window(self, job_id, items):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.process_rows(items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = str(e)
+                logger.warning("Batch job %s window failed (attempt %d): %s", job_id, attempt + 1, e)
+                if attempt < self.retries:
+                    await asyncio.sleep(self.retry_delay * 2 ** attempt)
+        # Results so far are kept; a resumed job starts again at this window
+        self.store.set_status(job_id, PAUSED, f"Paused after repeated failures: {error}")
+        return None
+
+    async def _worker(self):
+        # Batch jobs never use the model slots reserved for interactive calls
+        with background_work():
+            while True:
+                job_id = await self._queue.get()
+                try:
+                    await self._run_job(job_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("Batch job %s failed", job_id)
+                    self.store.set_status(job_id, FAILED, str(e))
+
+    def start(self):
+        if not self._workers:
+            self.store.fail_interrupted_ingestion()
+            for job_id in self.store.unfinished_jobs():
+                self._queue.put_nowait(job_id)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
@@ -0,0 +1,68 @@
+# concurrent_verify.py
+"""
+Fire concurrent /api/verify-medication requests at a running API and report
+whether their latencies overlap.
+
+If chain I/O runs concurrently, wall time stays close to the slowest single
+request; if requests are serialized, it approaches the sum of all latencies.
+
+Every request should name a different lot: identical requests in flight at
+the same time are coalesced by the API, so repeats measure deduplication
+rather than concurrent chain I/O.
+
+Usage:
+    python benchmarks/concurrent_verify.py --ndc 0002-8215-01 --lots BX729A44 BX729A45 BX729A46
+    python benchmarks/concurrent_verify.py --ndc 0002-8215-01 --lots-file lots.txt -n 20
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+async def timed_request(session, url, payload):
+    start = time.perf_counter()
+    async with session.post(url, json=payload) as response:
+        await response.read()
+        status = response.status
+    return status, time.perf_counter() - start
+
+async def main(args):
+    url = f"{args.api_url}/api/verify-medication"
+    lots = list(args.lots or [])
+    if args.lots_file:
+        with open(args.lots_file, "r", encoding="utf-8") as f:
+            lots.extend(line.strip() for line in f if line.strip())
+    lots = list(dict.fromkeys(lots))
+    if not lots:
+        raise SystemExit("Pass at least one lot with --lots or --lots-file")
+    requests = args.requests or len(lots)
+    if requests > len(lots):
+        print(f"warning: {requests} requests over {len(lots)} distinct lots; repeats are coalesced by the API")
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            timed_request(session, url, {"lotNumber": lots[i % len(lots)], "ndc": args.ndc})
+            for i in range(requests)
+        ))
+        wall = time.perf_counter() - start
+
+    latencies = [latency for _, latency in results]
+    statuses = sorted({status for status, _ in results})
+    print(f"requests:        {requests}")
+    print(f"distinct lots:   {min(requests, len(lots))}")
+    print(f"statuses:        {statuses}")
+    print(f"wall time:       {wall:.3f}s")
+    print(f"sum of latency:  {sum(latencies):.3f}s")
+    print(f"max latency:     {max(latencies):.3f}s")
+    print(f"overlap factor:  {sum(latencies) / wall:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--lots", nargs="+", help="Lot numbers, one request each")
+    parser.add_argument("--lots-file", help="File with one lot number per line")
+    parser.add_argument("--ndc", required=True)
+    parser.add_argument("-n", "--requests", type=int, help="Defaults to one request per lot")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+# document_ingest.py
+"""
+Compare per-document CPU time and peak RSS of the old and new image
+ingestion paths for /api/process-document, without calling Gemini.
+
+legacy:  copy the upload to a temp file, open it with PIL and re-encode it
+         into a BytesIO (the pre-change behaviour)
+current: image_ingest.prepare_image on the uploaded bytes
+
+Each path runs in its own subprocess so peak RSS is measured separately.
+
+Usage:
+    python benchmarks/document_ingest.py --image scan.jpg -n 50
+    python benchmarks/document_ingest.py --width 4000 --height 3000
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def legacy(data):
+    from PIL import Image
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
+    try:
+        shutil.copyfileobj(BytesIO(data), temp_file)
+    finally:
+        temp_file.close()
+    img = Image.open(temp_file.name)
+    buffer = BytesIO()
+    img.save(buffer, format=img.format)
+    os.unlink(temp_file.name)
+    return buffer.getvalue(), "image/jpeg"
+
+def current(data, max_pixels):
+    from image_ingest import prepare_image
+    return prepare_image(data, max_pixels)
+
+def synthetic_image(width, height):
+    import numpy as np
+    from PIL import Image
+    pixels = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def peak_rss_kb():
+    # ru_maxrss survives exec on Linux, so prefer the fresh address space's high-water mark
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_child(args):
+    with open(args.image, "rb") as f:
+        data = f.read()
+    start = time.process_time()
+    for _ in range(args.requests):
+        if args.mode == "legacy":
+            legacy(data)
+        else:
+            current(data, args.max_pixels)
+    cpu = (time.process_time() - start) / args.requests
+    peak_kb = peak_rss_kb()
+    print(f"{args.mode:8} cpu/doc: {cpu * 1000:8.2f} ms   peak RSS: {peak_kb / 1024:8.1f} MiB")
+
+def main(args):
+    image = args.image
+    if image is None:
+        fd, image = tempfile.mkstemp(suffix=".jpg")
+        with os.fdopen(fd, "wb") as f:
+            f.write(synthetic_image(args.width, args.height))
+    print(f"image: {os.path.getsize(image) / 1024:.0f} KiB, max pixels: {args.max_pixels}")
+    try:
+        for mode in ("legacy", "current"):
+            subprocess.run([
+                sys.executable, __file__, "--child", "--mode", mode, "--image", image,
+                "-n", str(args.requests), "--max-pixels", str(args.max_pixels)
+            ], check=True)
+    finally:
+        if args.image is None:
+            os.unlink(image)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Image to ingest (a random JPEG is generated if omitted)")
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--height", type=int, default=3508)
+    parser.add_argument("--max-pixels", type=int, default=3072 * 3072)
+    parser.add_argument("-n", "--requests", type=int, default=20)
+    parser.add_argument("--mode", choices=("legacy", "current"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+    else:
+        main(args)
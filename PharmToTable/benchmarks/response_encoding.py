@@ -0,0 +1,92 @@
+# response_encoding.py
+"""
+Compare encode time and payload size of medication-history responses for
+the old and new JSON paths, without a running API.
+
+fastapi: jsonable_encoder + JSONResponse.render (the pre-change behaviour)
+stdlib:  response_encoding.dumps with the stdlib encoder
+orjson:  response_encoding.dumps with orjson (skipped if not installed)
+
+Each body is then compressed with gzip and, if installed, brotli at the
+configured levels.
+
+Usage:
+    python benchmarks/response_encoding.py
+    python benchmarks/response_encoding.py --sizes 10 1000 100000 -n 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import response_encoding
+from response_encoding import compress, dumps
+
+def make_history(transfers):
+    # Same shape as event_index.format_transfer
+    start = datetime(2024, 1, 1)
+    parties = [f"0x{index:040x}" for index in range(1, 51)]
+    return [
+        {
+            "from": parties[index % len(parties)],
+            "to": parties[(index + 1) % len(parties)],
+            "lotNumber": "BX729A44",
+            "location": f"Warehouse {index % 200}, Springfield",
+            "timestamp": (start + timedelta(hours=index)).isoformat(),
+            "verified": index % 7 != 0,
+            "transactionHash": f"0x{index:064x}",
+            "blockNumber": 1000000 + index,
+            "confirmed": True
+        }
+        for index in range(transfers)
+    ]
+
+ENCODERS = {
+    "fastapi": lambda history: JSONResponse(jsonable_encoder(history)).body,
+    "stdlib": lambda history: dumps(history),
+    "orjson": lambda history: dumps(history, fast=True)
+}
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+def main(args):
+    encoders = dict(ENCODERS)
+    if response_encoding.orjson is None:
+        del encoders["orjson"]
+    encodings = ["gzip"] + (["br"] if response_encoding.brotli is not None else [])
+
+    print(f"{'transfers':>10} {'encoder':>8} {'encode ms':>10} {'bytes':>12} "
+          + " ".join(f"{name + ' bytes':>12} {name + ' ms':>9}" for name in encodings))
+    for transfers in args.sizes:
+        history = make_history(transfers)
+        repeats = max(1, args.repeats if transfers < 100000 else args.repeats // 5)
+        for name, encode in encoders.items():
+            body, seconds = timed(lambda: encode(history), repeats)
+            columns = []
+            for encoding in encodings:
+                compressed, compress_seconds = timed(
+                    lambda: compress(body, encoding, args.gzip_level, args.brotli_quality), repeats
+                )
+                columns.append(f"{len(compressed):>12} {compress_seconds * 1000:>9.2f}")
+            print(f"{transfers:>10} {name:>8} {seconds * 1000:>10.2f} {len(body):>12} " + " ".join(columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("-n", "--repeats", type=int, default=20)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    main(parser.parse_args())
@@ -1,12 +1,54 @@
 # blockchain.py
+import asyncio
 import json
 from datetime import datetime
-from web3 import Web3
+import aiohttp
+from web3 import AsyncWeb3
+from web3.exceptions import BlockNotFound, TransactionNotFound
 from eth_account import Account
-from config import BLOCKCHAIN_PROVIDER_URL, CONTRACT_ADDRESS, PRIVATE_KEY
+from hexbytes import HexBytes
+from config import (
+    BLOCKCHAIN_PROVIDER_URL,
+    RPC_POOL_SIZE,
+    RPC_KEEPALIVE_SECONDS,
+    RPC_TIMEOUT_SECONDS,
+    CONTRACT_ADDRESS,
+    ROLE_ACCESS_CONTROL_ADDRESS,
+    PRIVATE_KEY,
+    EVENT_INDEX_PATH,
+    EVENT_INDEX_START_BLOCK,
+    EVENT_INDEX_POLL_SECONDS,
+    EVENT_INDEX_BATCH_BLOCKS,
+    EVENT_INDEX_CONFIRMATIONS,
+    LOG_FETCH_INITIAL_WINDOW,
+    LOG_FETCH_MAX_WINDOW,
+    LOG_FETCH_CONCURRENCY,
+    LOG_FETCH_TARGET_RESULTS,
+    TX_MAX_IN_FLIGHT,
+    TX_RECEIPT_POLL_SECONDS,
+    TX_RECEIPT_TIMEOUT_SECONDS,
+    FEE_POLL_SECONDS,
+    FEE_GAS_MARGIN,
+    CHAIN_CACHE_SIZE,
+    CHAIN_CACHE_MAX_AGE_BLOCKS,
+    VERIFY_BATCH_SIZE,
+    VERIFY_BATCH_CONCURRENCY
+)
+from event_index import (
+    TransferIndex,
+    TransferIndexer,
+    decode_transfer,
+    format_transfer,
+    paginate_transfers,
+    format_page
+)
+from log_fetcher import LogFetcher
+from tx_submitter import TransactionSubmitter
+from fee_oracle import FeeOracle
+from chain_cache import LotCache
 
-# Connect to blockchain
-w3 = Web3(Web3.HTTPProvider(BLOCKCHAIN_PROVIDER_URL))
+# Connect to blockchain; requests share the session installed by open_rpc_session
+w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(BLOCKCHAIN_PROVIDER_URL))
 
 # Load contract ABI
 with open('contracts/PharmaceuticalTracker.json', 'r') as f:
@@ -16,13 +58,152 @@ with open('contracts/PharmaceuticalTracker.json', 'r') as f:
 # Create contract instance
 contract = w3.eth.contract(address=CONTRACT_ADDRESS, abi=contract_abi)
 
+# Optional RoleAccessControl instance used to resolve the roles of transfer parties
+if ROLE_ACCESS_CONTROL_ADDRESS:
+    with open('contracts/RoleAccessControl.json', 'r') as f:
+        role_contract = w3.eth.contract(address=ROLE_ACCESS_CONTROL_ADDRESS, abi=json.load(f)['abi'])
+else:
+    role_contract = None
+
 # Account setup for transactions (if private key provided)
 if PRIVATE_KEY:
     account = Account.from_key(PRIVATE_KEY)
     account_address = account.address
+    # Single owner of the signer's nonces so concurrent writes never collide
+    tx_submitter = TransactionSubmitter(
+        w3,
+        account,
+        max_in_flight=TX_MAX_IN_FLIGHT,
+        poll_interval=TX_RECEIPT_POLL_SECONDS,
+        receipt_timeout=TX_RECEIPT_TIMEOUT_SECONDS
+    )
 else:
     account = None
     account_address = None
+    tx_submitter = None
+
+# Fee suggestions and gas estimates shared by all writes
+fee_oracle = FeeOracle(w3, poll_interval=FEE_POLL_SECONDS, gas_margin=FEE_GAS_MARGIN)
+
+_rpc_session = None
+
+async def open_rpc_session():
+    """
+    Create the pooled keep-alive HTTP session used for all JSON-RPC calls
+    """
+    global _rpc_session
+    if _rpc_session is None:
+        _rpc_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=RPC_POOL_SIZE,
+                keepalive_timeout=RPC_KEEPALIVE_SECONDS
+            ),
+            timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT_SECONDS)
+        )
+        await w3.provider.cache_async_session(_rpc_session)
+    return _rpc_session
+
+async def close_rpc_session():
+    """
+    Close the shared JSON-RPC session
+    """
+    global _rpc_session
+    if _rpc_session is not None:
+        await _rpc_session.close()
+        _rpc_session = None
+
+async def _get_transfer_logs(from_block, to_block, argument_filters=None):
+    return await contract.events.Transfer.get_logs(
+        fromBlock=from_block,
+        toBlock=to_block,
+        argument_filters=argument_filters
+    )
+
+# Splits large block spans into adaptive windows fetched concurrently
+log_fetcher = LogFetcher(
+    _get_transfer_logs,
+    initial_window=LOG_FETCH_INITIAL_WINDOW,
+    max_window=LOG_FETCH_MAX_WINDOW,
+    concurrency=LOG_FETCH_CONCURRENCY,
+    target_results=LOG_FETCH_TARGET_RESULTS
+)
+
+async def _fetch_transfer_logs(from_block, to_block):
+    return await log_fetcher.fetch(from_block, to_block)
+
+async def _get_block_number():
+    return await w3.eth.block_number
+
+async def _get_block_header(block_number):
+    try:
+        block = await w3.eth.get_block(block_number)
+    except BlockNotFound:
+        return None
+    return {
+        'number': block['number'],
+        'hash': block['hash'].hex(),
+        'parentHash': block['parentHash'].hex()
+    }
+
+# Read-through caches in front of history and verification lookups
+history_cache = LotCache(max_entries=CHAIN_CACHE_SIZE, max_age_blocks=CHAIN_CACHE_MAX_AGE_BLOCKS)
+# Registration emits no Transfer event, so "not registered" is never cached:
+# the indexer could not invalidate it when another writer registers the lot
+verification_cache = LotCache(
+    max_entries=CHAIN_CACHE_SIZE,
+    max_age_blocks=CHAIN_CACHE_MAX_AGE_BLOCKS,
+    cache_if=lambda result: result['registered']
+)
+# Roles change rarely, so they are only refreshed by head staleness
+role_cache = LotCache(max_entries=CHAIN_CACHE_SIZE, max_age_blocks=CHAIN_CACHE_MAX_AGE_BLOCKS)
+
+def _invalidate_caches(lot_numbers):
+    history_cache.invalidate(lot_numbers)
+    verification_cache.invalidate(lot_numbers)
+
+def get_cache_stats():
+    """
+    Return hit/miss counters for the chain read caches
+    """
+    return {
+        'history': history_cache.stats(),
+        'verification': verification_cache.stats(),
+        'roles': role_cache.stats()
+    }
+
+# Local index of Transfer events, kept current by a background indexer
+transfer_index = TransferIndex(EVENT_INDEX_PATH)
+transfer_indexer = TransferIndexer(
+    transfer_index,
+    fetch_logs=_fetch_transfer_logs,
+    get_block_number=_get_block_number,
+    get_block=_get_block_header,
+    start_block=EVENT_INDEX_START_BLOCK,
+    poll_interval=EVENT_INDEX_POLL_SECONDS,
+    batch_blocks=EVENT_INDEX_BATCH_BLOCKS,
+    confirmations=EVENT_INDEX_CONFIRMATIONS,
+    on_change=_invalidate_caches
+)
+
+async def start_blockchain_services():
+    """
+    Open the shared RPC session and start tailing Transfer logs into the local index
+    """
+    await open_rpc_session()
+    transfer_indexer.start()
+    if tx_submitter is not None:
+        fee_oracle.start()
+
+async def stop_blockchain_services():
+    """
+    Stop background workers, close the index store and the RPC session
+    """
+    if tx_submitter is not None:
+        await tx_submitter.stop()
+    await fee_oracle.stop()
+    await transfer_indexer.stop()
+    transfer_index.close()
+    await close_rpc_session()
 
 async def get_medication_history(lot_number):
     """
@@ -34,35 +215,125 @@ async def get_medication_history(lot_number):
     Returns:
         list: List of transfer events
     """
+    # The indexer's head is only known once it is running; until then skip the cache
+    return await history_cache.get_or_load(lot_number, transfer_indexer.head, _load_medication_history)
+
+async def _load_medication_history(lot_number):
     try:
-        # Create filter for Transfer events with the lot number
-        transfer_filter = contract.events.Transfer.create_filter(
-            fromBlock=0,
+        # Serve from the local index once it has caught up with the chain
+        if transfer_indexer.ready:
+            return transfer_index.get_history(lot_number, transfer_indexer.finalized_block)
+
+        # Otherwise fall back to scanning the chain for this lot
+        head = await w3.eth.block_number
+        events = await log_fetcher.fetch(
+            EVENT_INDEX_START_BLOCK,
+            head,
             argument_filters={'lotNumber': lot_number}
         )
+
+        finalized_block = head - EVENT_INDEX_CONFIRMATIONS
+        return [format_transfer(decode_transfer(event), finalized_block) for event in events]
+    except Exception as e:
+        raise Exception(f"Error fetching medication history: {str(e)}")
+
+async def get_medication_history_page(lot_number, after=None, order="asc", limit=None, fields=None):
+    """
+    Fetch one page of a lot's transfer history
+    
+    The cursor, order, limit and field selection are pushed down into the
+    local index query, so transfers outside the page are never read. Until
+    the index has caught up, the chain is scanned instead, narrowed to the
+    blocks on the far side of the cursor.
+    
+    Args:
+        lot_number: Lot number to query
+        after: (blockNumber, logIndex) to continue after, or None to start
+            from the first transfer in `order`
+        order: "asc" for oldest first or "desc" for newest first
+        limit: Maximum number of transfers, or None for all of them
+        fields: History fields to include, or None for every field
         
-        # Get all events
-        events = transfer_filter.get_all_entries()
-        
-        # Format the events
-        formatted_events = []
-        for event in events:
-            args = event['args']
-            formatted_events.append({
-                'from': args['from'],
-                'to': args['to'],
-                'lotNumber': args['lotNumber'],
-                'location': args['location'],
-                'timestamp': datetime.fromtimestamp(args['timestamp']).isoformat(),
-                'verified': args['verified'],
-                'transactionHash': event['transactionHash'].hex(),
-                'blockNumber': event['blockNumber']
-            })
-            
-        return formatted_events
+    Returns:
+        tuple: (transfers, (blockNumber, logIndex) to pass as `after` for
+            the next page, or None on the last page)
+    """
+    try:
+        if transfer_indexer.ready:
+            return transfer_index.get_history_page(
+                lot_number, after, order, limit, fields, transfer_indexer.finalized_block
+            )
+
+        head = await w3.eth.block_number
+        from_block, to_block = EVENT_INDEX_START_BLOCK, head
+        if after is not None:
+            if order == "desc":
+                to_block = min(to_block, after[0])
+            else:
+                from_block = max(from_block, after[0])
+        events = await log_fetcher.fetch(from_block, to_block, argument_filters={'lotNumber': lot_number})
+
+        transfers = paginate_transfers([decode_transfer(event) for event in events], after, order, limit)
+        return format_page(transfers, limit, fields, head - EVENT_INDEX_CONFIRMATIONS)
     except Exception as e:
         raise Exception(f"Error fetching medication history: {str(e)}")
 
+def _receipt_summary(receipt):
+    return {
+        'success': receipt.status == 1,
+        'transactionHash': receipt.transactionHash.hex(),
+        'blockNumber': receipt.blockNumber,
+        'gasUsed': receipt.gasUsed
+    }
+
+def _transfer_call(transfer_data):
+    return contract.functions.recordTransfer(
+        transfer_data['from'],
+        transfer_data['to'],
+        transfer_data['lotNumber'],
+        transfer_data['ndc'],
+        transfer_data['quantity'],
+        transfer_data['expirationDate'],
+        int(datetime.fromisoformat(transfer_data['transferDate']).timestamp())
+    )
+
+def _registration_call(medication_data):
+    # Convert dates to timestamps
+    expiration_timestamp = int(datetime.fromisoformat(medication_data['expirationDate']).timestamp())
+    manufacturing_timestamp = int(datetime.fromisoformat(medication_data['manufacturingDate']).timestamp())
+
+    return contract.functions.registerMedication(
+        medication_data['lotNumber'],
+        medication_data['ndc'],
+        medication_data['quantity'],
+        expiration_timestamp,
+        manufacturing_timestamp,
+        medication_data['manufacturerLocation']
+    )
+
+async def _submit(call, lot_number):
+    if not PRIVATE_KEY:
+        raise Exception("Private key not configured for blockchain transactions")
+
+    # Sign and send through the submitter, which assigns the nonce locally
+    # Gas and fees come from cached estimates, so no fee RPCs run per write
+    tx_hash, receipt_future = await tx_submitter.submit(call, {
+        'gas': await fee_oracle.estimate_gas(call, account_address),
+        **await fee_oracle.fee_params()
+    })
+
+    # Our own write changes this lot's state; drop it from cache once mined
+    receipt_future.add_done_callback(lambda _: _invalidate_caches({lot_number}))
+    return tx_hash, receipt_future
+
+def _submission_summary(tx_hash):
+    record = tx_submitter.get_record(tx_hash.hex())
+    return {
+        'jobId': record['jobId'],
+        'transactionHash': record['transactionHash'],
+        'status': record['status']
+    }
+
 async def record_transfer(transfer_data):
     """
     Record a medication transfer on the blockchain
@@ -73,39 +344,29 @@ async def record_transfer(transfer_data):
     Returns:
         dict: Transaction receipt details
     """
-    if not PRIVATE_KEY:
-        raise Exception("Private key not configured for blockchain transactions")
-    
     try:
-        # Prepare transaction
-        tx = contract.functions.recordTransfer(
-            transfer_data['from'],
-            transfer_data['to'],
-            transfer_data['lotNumber'],
-            transfer_data['ndc'],
-            transfer_data['quantity'],
-            transfer_data['expirationDate'],
-            int(datetime.fromisoformat(transfer_data['transferDate']).timestamp())
-        ).build_transaction({
-            'from': account_address,
-            'nonce': w3.eth.get_transaction_count(account_address),
-            'gas': 2000000,
-            'gasPrice': w3.eth.gas_price
-        })
+        _, receipt_future = await _submit(_transfer_call(transfer_data), transfer_data['lotNumber'])
         
-        # Sign and send transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        # Wait for the receipt watcher to confirm the transaction
+        receipt = await receipt_future
         
-        # Wait for transaction receipt
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        return _receipt_summary(receipt)
+    except Exception as e:
+        raise Exception(f"Error recording transfer on blockchain: {str(e)}")
+
+async def submit_transfer(transfer_data):
+    """
+    Send a medication transfer without waiting for it to be mined
+    
+    Args:
+        transfer_data: Data about the transfer
         
-        return {
-            'success': receipt.status == 1,
-            'transactionHash': receipt.transactionHash.hex(),
-            'blockNumber': receipt.blockNumber,
-            'gasUsed': receipt.gasUsed
-        }
+    Returns:
+        dict: Job id, transaction hash and initial status
+    """
+    try:
+        tx_hash, _ = await _submit(_transfer_call(transfer_data), transfer_data['lotNumber'])
+        return _submission_summary(tx_hash)
     except Exception as e:
         raise Exception(f"Error recording transfer on blockchain: {str(e)}")
 
@@ -119,45 +380,89 @@ async def register_medication(medication_data):
     Returns:
         dict: Transaction receipt details
     """
-    if not PRIVATE_KEY:
-        raise Exception("Private key not configured for blockchain transactions")
-    
     try:
-        # Convert dates to timestamps
-        expiration_timestamp = int(datetime.fromisoformat(medication_data['expirationDate']).timestamp())
-        manufacturing_timestamp = int(datetime.fromisoformat(medication_data['manufacturingDate']).timestamp())
-        
-        # Prepare transaction
-        tx = contract.functions.registerMedication(
-            medication_data['lotNumber'],
-            medication_data['ndc'],
-            medication_data['quantity'],
-            expiration_timestamp,
-            manufacturing_timestamp,
-            medication_data['manufacturerLocation']
-        ).build_transaction({
-            'from': account_address,
-            'nonce': w3.eth.get_transaction_count(account_address),
-            'gas': 2000000,
-            'gasPrice': w3.eth.gas_price
-        })
+        _, receipt_future = await _submit(_registration_call(medication_data), medication_data['lotNumber'])
         
-        # Sign and send transaction
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        # Wait for the receipt watcher to confirm the transaction
+        receipt = await receipt_future
         
-        # Wait for transaction receipt
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        return _receipt_summary(receipt)
+    except Exception as e:
+        raise Exception(f"Error registering medication on blockchain: {str(e)}")
+
+async def submit_registration(medication_data):
+    """
+    Send a medication registration without waiting for it to be mined
+    
+    Args:
+        medication_data: Data about the medication
         
-        return {
-            'success': receipt.status == 1,
-            'transactionHash': receipt.transactionHash.hex(),
-            'blockNumber': receipt.blockNumber,
-            'gasUsed': receipt.gasUsed
-        }
+    Returns:
+        dict: Job id, transaction hash and initial status
+    """
+    try:
+        tx_hash, _ = await _submit(_registration_call(medication_data), medication_data['lotNumber'])
+        return _submission_summary(tx_hash)
     except Exception as e:
         raise Exception(f"Error registering medication on blockchain: {str(e)}")
 
+async def get_transaction_status(tx_id):
+    """
+    Report the status of a submitted transaction
+    
+    Args:
+        tx_id: Transaction hash as a 0x-prefixed hex string, or the jobId
+            returned when this process submitted it
+        
+    Returns:
+        dict: Status (pending/mined/failed), gas used and confirmation count,
+              or None if the transaction is unknown
+    """
+    try:
+        record = tx_submitter.get_record(tx_id) if tx_submitter else None
+        if record is None:
+            if not tx_id.startswith("0x"):
+                # Job ids are only known to the process that issued them
+                return None
+            tx_hash = tx_id
+            # Not submitted by this process (or evicted); ask the node directly
+            try:
+                receipt = await w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                try:
+                    await w3.eth.get_transaction(tx_hash)
+                except TransactionNotFound:
+                    return None
+                receipt = None
+            record = {
+                'jobId': None,
+                'transactionHash': tx_hash,
+                'status': 'pending' if receipt is None else ('mined' if receipt.status == 1 else 'failed'),
+                'blockNumber': receipt.blockNumber if receipt else None,
+                'gasUsed': receipt.gasUsed if receipt else None,
+                'error': None
+            }
+
+        confirmations = 0
+        if record['blockNumber'] is not None:
+            confirmations = max(await w3.eth.block_number - record['blockNumber'] + 1, 0)
+
+        return {**record, 'confirmations': confirmations}
+    except Exception as e:
+        raise Exception(f"Error fetching transaction status: {str(e)}")
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+def _format_verification(result):
+    return {
+        'isAuthentic': result[0],  # Assuming result is a tuple with isAuthentic as first element
+        'manufacturer': result[1],
+        'registrationTime': datetime.fromtimestamp(result[2]).isoformat(),
+        'transferCount': result[3],
+        # Unregistered lots come back as an empty record
+        'registered': result[1] != ZERO_ADDRESS and result[2] != 0
+    }
+
 async def verify_on_chain(lot_number):
     """
     Verify a medication's authenticity directly on the blockchain
@@ -168,15 +473,133 @@ async def verify_on_chain(lot_number):
     Returns:
         dict: Verification result
     """
+    return await verification_cache.get_or_load(lot_number, transfer_indexer.head, _load_verification)
+
+async def _load_verification(lot_number):
     try:
         # Call the view function
-        result = contract.functions.verifyMedication(lot_number).call()
+        result = await contract.functions.verifyMedication(lot_number).call()
         
-        return {
-            'isAuthentic': result[0],  # Assuming result is a tuple with isAuthentic as first element
-            'manufacturer': result[1],
-            'registrationTime': datetime.fromtimestamp(result[2]).isoformat(),
-            'transferCount': result[3]
-        }
+        return _format_verification(result)
     except Exception as e:
         raise Exception(f"Error verifying medication on blockchain: {str(e)}")
+
+async def _verify_chunk(lot_numbers, output_types):
+    # One JSON-RPC batch request carrying an eth_call per lot
+    batch = [
+        {
+            'jsonrpc': '2.0',
+            'id': i,
+            'method': 'eth_call',
+            'params': [
+                {
+                    'to': CONTRACT_ADDRESS,
+                    'data': contract.encodeABI(fn_name='verifyMedication', args=[lot_number])
+                },
+                'latest'
+            ]
+        }
+        for i, lot_number in enumerate(lot_numbers)
+    ]
+
+    session = await open_rpc_session()
+    async with session.post(BLOCKCHAIN_PROVIDER_URL, json=batch) as response:
+        response.raise_for_status()
+        replies = await response.json()
+
+    # Batch replies may arrive in any order; match them back up by id
+    results = [Exception("No response from node")] * len(lot_numbers)
+    for reply in replies:
+        if 'error' in reply:
+            message = reply['error'].get('message', reply['error'])
+            results[reply['id']] = Exception(f"Error verifying medication on blockchain: {message}")
+        else:
+            decoded = w3.codec.decode(output_types, HexBytes(reply['result']))
+            results[reply['id']] = _format_verification(decoded)
+    return results
+
+async def verify_on_chain_many(lot_numbers, chunk_size=VERIFY_BATCH_SIZE):
+    """
+    Verify many medications using JSON-RPC batch requests
+    
+    Lots are split into chunks of `chunk_size`, each sent as a single batch of
+    `eth_call`s, and up to VERIFY_BATCH_CONCURRENCY chunks are in flight at once.
+    
+    Args:
+        lot_numbers: Lot numbers to verify
+        chunk_size: Number of calls packed into each batch request
+        
+    Returns:
+        list: One entry per lot number, in input order. Each entry is either
+              a verification result dict or the Exception raised for that lot.
+    """
+    lot_numbers = list(lot_numbers)
+    head = transfer_indexer.head
+
+    # Only lots missing from the cache go to the node
+    results = [None] * len(lot_numbers)
+    missing = []
+    for i, lot_number in enumerate(lot_numbers):
+        found, value = verification_cache.get(lot_number, head) if head is not None else (False, None)
+        if found:
+            results[i] = value
+        else:
+            missing.append(i)
+
+    fn_abi = contract.get_function_by_name('verifyMedication').abi
+    output_types = [output['type'] for output in fn_abi['outputs']]
+    limiter = asyncio.Semaphore(VERIFY_BATCH_CONCURRENCY)
+
+    async def run_chunk(chunk):
+        async with limiter:
+            try:
+                return await _verify_chunk(chunk, output_types)
+            except Exception as e:
+                error = Exception(f"Error verifying medication on blockchain: {str(e)}")
+                return [error] * len(chunk)
+
+    missing_lots = [lot_numbers[i] for i in missing]
+    chunks = [missing_lots[i:i + chunk_size] for i in range(0, len(missing_lots), chunk_size)]
+    chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    fetched = [result for chunk_result in chunk_results for result in chunk_result]
+
+    for i, result in zip(missing, fetched):
+        results[i] = result
+        if head is not None and not isinstance(result, Exception):
+            verification_cache.put(lot_numbers[i], result, head)
+    return results
+
+async def _load_role(address):
+    # Check the roles TransferTracker.onlyValidTransfer cares about
+    checks = [
+        ('manufacturer', role_contract.functions.isManufacturer(address)),
+        ('wholesaler', role_contract.functions.isWholesaler(address)),
+        ('pharmacy', role_contract.functions.isPharmacy(address))
+    ]
+    # An address can hold several roles, so all of them are kept
+    results = await asyncio.gather(*(call.call() for _, call in checks))
+    return frozenset(role for (role, _), has_role in zip(checks, results) if has_role)
+
+async def get_address_roles(addresses):
+    """
+    Resolve the supply-chain role of each address via RoleAccessControl
+    
+    Args:
+        addresses: Addresses to look up
+        
+    Returns:
+        dict: Address to the frozenset of its role names ('manufacturer',
+              'wholesaler', 'pharmacy'); empty for an address with no role.
+              Empty when no RoleAccessControl address is configured.
+    """
+    if role_contract is None:
+        return {}
+    
+    try:
+        addresses = sorted(set(addresses))
+        roles = await asyncio.gather(*(
+            role_cache.get_or_load(address, transfer_indexer.head, _load_role) for address in addresses
+        ))
+        return dict(zip(addresses, roles))
+    except Exception as e:
+        raise Exception(f"Error resolving roles on blockchain: {str(e)}")
@@ -0,0 +1,109 @@
+# chain_cache.py
+import asyncio
+from collections import OrderedDict
+from single_flight import SingleFlight
+
+class LotCache:
+    """
+    Read-through LRU cache of per-lot chain data
+
+    Entries remember the chain head they were loaded at. An entry is served
+    until a new event for its lot invalidates it or the head moves more than
+    `max_age_blocks` past the load point. Concurrent misses for the same lot
+    share one load. Hit/miss counters are kept so the cache can be sized
+    against real traffic.
+
+    Args:
+        max_entries: Maximum number of lots kept before evicting the least recently used
+        max_age_blocks: Blocks after which an entry is considered stale
+        cache_if: Optional predicate on a loaded value; values it rejects are
+            returned but not cached, for state that changes without an event
+            that would invalidate the entry
+    """
+
+    def __init__(self, max_entries=10000, max_age_blocks=100, cache_if=None):
+        self.max_entries = max_entries
+        self.max_age_blocks = max_age_blocks
+        self.cache_if = cache_if
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._loads = SingleFlight()
+
+    def get(self, lot_number, head):
+        """
+        Return (True, value) for a fresh entry, otherwise (False, None)
+        """
+        entry = self._entries.get(lot_number)
+        if entry is not None:
+            value, loaded_at = entry
+            if head - loaded_at <= self.max_age_blocks:
+                self._entries.move_to_end(lot_number)
+                self.hits += 1
+                return True, value
+            del self._entries[lot_number]
+        self.misses += 1
+        return False, None
+
+    def put(self, lot_number, value, head):
+        if self.cache_if is not None and not self.cache_if(value):
+            return
+        self._entries[lot_number] = (value, head)
+        self._entries.move_to_end(lot_number)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, lot_numbers=None):
+        """
+        Drop entries for the given lots, or every entry when `lot_numbers` is None
+        """
+        # Loads already running may have read the old state; later callers start over
+        self._loads.forget(lot_numbers)
+        if lot_numbers is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            return
+        for lot_number in lot_numbers:
+            if self._entries.pop(lot_number, None) is not None:
+                self.invalidations += 1
+
+    async def get_or_load(self, lot_number, head, loader):
+        """
+        Serve a lot from the cache, calling `loader(lot_number)` on a miss
+
+        Args:
+            lot_number: Cache key
+            head: Current chain head, or None to bypass the cache
+            loader: async callable producing the value for a lot
+        """
+        if head is None:
+            return await self._loads.do(lot_number, loader, lot_number)
+
+        found, value = self.get(lot_number, head)
+        if found:
+            return value
+
+        return await self._loads.do(lot_number, self._load, lot_number, head, loader)
+
+    async def _load(self, lot_number, head, loader):
+        value = await loader(lot_number)
+        # Skip caching a value the lot was invalidated against mid-load
+        if self._loads.is_current(lot_number, asyncio.current_task()):
+            self.put(lot_number, value, head)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'maxEntries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'coalescedLoads': self._loads.shared
+        }
@@ -1,23 +1,133 @@
 # config.py
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # Load environment variables
 load_dotenv()
 
-# Get API key from environment
+# LLM backend: "gemini", "stub" (canned JSON, no network), "record" (Gemini,
+# saving every reply) or "replay" (saved replies only, no network)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+# Get API key from environment; only the backends that call Gemini need it
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
+if LLM_BACKEND in ("gemini", "record") and not GEMINI_API_KEY:
     raise ValueError("Missing GEMINI_API_KEY environment variable")
 
-# Configure the Gemini API
-genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-1.5-pro")
+
+# Stub backend latency and optional canned replies; record/replay storage
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "0"))
+LLM_STUB_RESPONSES_PATH = os.getenv("LLM_STUB_RESPONSES_PATH")
+LLM_RECORDINGS_DIR = os.getenv("LLM_RECORDINGS_DIR", "llm_recordings")
+
+# Gemini call limits: concurrency, per-minute budgets, slots kept for interactive calls
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8"))
+GEMINI_RESERVED_INTERACTIVE = int(os.getenv("GEMINI_RESERVED_INTERACTIVE", "2"))
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# Token budget for a transfer history embedded in a prompt; longer histories are sampled
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "6000"))
+
+# Batched verification for /api/batch-process: prompt budget, lots per request, retries of malformed items
+GEMINI_BATCH_TOKEN_BUDGET = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", "24000"))
+GEMINI_BATCH_MAX_LOTS = int(os.getenv("GEMINI_BATCH_MAX_LOTS", "25"))
+GEMINI_BATCH_RETRIES = int(os.getenv("GEMINI_BATCH_RETRIES", "2"))
+GEMINI_BATCH_HISTORY_TOKEN_BUDGET = int(os.getenv("GEMINI_BATCH_HISTORY_TOKEN_BUDGET", "1500"))
 
-# Initialize model
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Local chain-of-custody rules that can answer verifications without Gemini
+CUSTODY_MAX_GAP_DAYS = int(os.getenv("CUSTODY_MAX_GAP_DAYS", "30"))
+CUSTODY_PASS_SCORE = float(os.getenv("CUSTODY_PASS_SCORE", "0.8"))
+CUSTODY_FAIL_SCORE = float(os.getenv("CUSTODY_FAIL_SCORE", "0.4"))
+
+# Local journey metrics for /api/journey-map
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "geocode_cache.db")
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", "data/gazetteer.csv")
+JOURNEY_MAX_SPEED_KMH = float(os.getenv("JOURNEY_MAX_SPEED_KMH", "900"))
+
+# Document images above this many pixels are downscaled before upload
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(3072 * 3072)))
+
+# Map-reduce ledger analysis: rows per chunk, concurrent chunk prompts, unusual gap
+LEDGER_CHUNK_ROWS = int(os.getenv("LEDGER_CHUNK_ROWS", "50000"))
+LEDGER_MAP_CONCURRENCY = int(os.getenv("LEDGER_MAP_CONCURRENCY", "4"))
+LEDGER_GAP_DAYS = int(os.getenv("LEDGER_GAP_DAYS", os.getenv("CUSTODY_MAX_GAP_DAYS", "30")))
+
+# Gemini response cache (memory and disk tiers, per-helper TTLs in seconds)
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+LLM_CACHE_DISK_BYTES = int(os.getenv("LLM_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+LLM_CACHE_TTLS = {
+    "process_document_image": float(os.getenv("LLM_CACHE_TTL_DOCUMENT", "604800")),
+    "analyze_ledger_data": float(os.getenv("LLM_CACHE_TTL_LEDGER", "86400")),
+    "analyze_ledger_chunk": float(os.getenv("LLM_CACHE_TTL_LEDGER", "86400")),
+    "summarize_ledger": float(os.getenv("LLM_CACHE_TTL_LEDGER", "86400")),
+    "verify_medication": float(os.getenv("LLM_CACHE_TTL_VERIFY", "86400")),
+    "verify_medication_batch": float(os.getenv("LLM_CACHE_TTL_VERIFY", "86400")),
+    "generate_journey_visualization": float(os.getenv("LLM_CACHE_TTL_JOURNEY", "86400")),
+    "narrate_journey": float(os.getenv("LLM_CACHE_TTL_JOURNEY", "86400"))
+}
 
 # Blockchain configuration
 BLOCKCHAIN_PROVIDER_URL = os.getenv("BLOCKCHAIN_PROVIDER_URL", "http://localhost:8545")
 CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
+ROLE_ACCESS_CONTROL_ADDRESS = os.getenv("ROLE_ACCESS_CONTROL_ADDRESS")  # Optional, enables role checks
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")  # For transactions that modify state
+
+# JSON-RPC connection pool shared by all blockchain calls
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "100"))
+RPC_KEEPALIVE_SECONDS = float(os.getenv("RPC_KEEPALIVE_SECONDS", "30"))
+RPC_TIMEOUT_SECONDS = float(os.getenv("RPC_TIMEOUT_SECONDS", "30"))
+
+# Transaction submission
+TX_MAX_IN_FLIGHT = int(os.getenv("TX_MAX_IN_FLIGHT", "256"))
+TX_RECEIPT_POLL_SECONDS = float(os.getenv("TX_RECEIPT_POLL_SECONDS", "1"))
+TX_RECEIPT_TIMEOUT_SECONDS = float(os.getenv("TX_RECEIPT_TIMEOUT_SECONDS", "300"))
+
+# Fee oracle and gas estimation
+FEE_POLL_SECONDS = float(os.getenv("FEE_POLL_SECONDS", "3"))
+FEE_GAS_MARGIN = float(os.getenv("FEE_GAS_MARGIN", "0.2"))
+
+# Bulk on-chain verification (JSON-RPC batching)
+VERIFY_BATCH_SIZE = int(os.getenv("VERIFY_BATCH_SIZE", "100"))
+VERIFY_BATCH_CONCURRENCY = int(os.getenv("VERIFY_BATCH_CONCURRENCY", "4"))
+
+# Persisted batch jobs for /api/batch-process, the number processed at once,
+# and retries of a window that fails (e.g. on a transient RPC error)
+BATCH_JOBS_PATH = os.getenv("BATCH_JOBS_PATH", "batch_jobs.db")
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "2"))
+BATCH_INGEST_CHUNK_ROWS = int(os.getenv("BATCH_INGEST_CHUNK_ROWS", "50000"))
+BATCH_WINDOW_RETRIES = int(os.getenv("BATCH_WINDOW_RETRIES", "3"))
+BATCH_RETRY_DELAY_SECONDS = float(os.getenv("BATCH_RETRY_DELAY_SECONDS", "2"))
+
+# JSON responses of history-heavy endpoints: orjson encoding (opt-in, needs the
+# orjson package) and gzip/brotli above a size in bytes (negative disables)
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+# Per-stage timeouts for /api/verify-medication (seconds)
+VERIFY_ONCHAIN_TIMEOUT_SECONDS = float(os.getenv("VERIFY_ONCHAIN_TIMEOUT_SECONDS", "5"))
+VERIFY_HISTORY_TIMEOUT_SECONDS = float(os.getenv("VERIFY_HISTORY_TIMEOUT_SECONDS", "10"))
+VERIFY_ROLES_TIMEOUT_SECONDS = float(os.getenv("VERIFY_ROLES_TIMEOUT_SECONDS", "5"))
+VERIFY_MODEL_TIMEOUT_SECONDS = float(os.getenv("VERIFY_MODEL_TIMEOUT_SECONDS", "60"))
+
+# Read-through cache for per-lot history and verification lookups
+CHAIN_CACHE_SIZE = int(os.getenv("CHAIN_CACHE_SIZE", "10000"))
+CHAIN_CACHE_MAX_AGE_BLOCKS = int(os.getenv("CHAIN_CACHE_MAX_AGE_BLOCKS", "100"))
+
+# Local Transfer event index
+EVENT_INDEX_PATH = os.getenv("EVENT_INDEX_PATH", "event_index.db")
+EVENT_INDEX_START_BLOCK = int(os.getenv("EVENT_INDEX_START_BLOCK", "0"))
+EVENT_INDEX_POLL_SECONDS = float(os.getenv("EVENT_INDEX_POLL_SECONDS", "5"))
+EVENT_INDEX_BATCH_BLOCKS = int(os.getenv("EVENT_INDEX_BATCH_BLOCKS", "50000"))
+EVENT_INDEX_CONFIRMATIONS = int(os.getenv("EVENT_INDEX_CONFIRMATIONS", "12"))
+
+# Adaptive eth_getLogs windows used by history lookups and the indexer
+LOG_FETCH_INITIAL_WINDOW = int(os.getenv("LOG_FETCH_INITIAL_WINDOW", "2000"))
+LOG_FETCH_MAX_WINDOW = int(os.getenv("LOG_FETCH_MAX_WINDOW", "100000"))
+LOG_FETCH_CONCURRENCY = int(os.getenv("LOG_FETCH_CONCURRENCY", "4"))
+LOG_FETCH_TARGET_RESULTS = int(os.getenv("LOG_FETCH_TARGET_RESULTS", "2000"))
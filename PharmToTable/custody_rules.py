@@ -0,0 +1,122 @@
+# custody_rules.py
+from datetime import datetime
+
+MANUFACTURER = "manufacturer"
+WHOLESALER = "wholesaler"
+PHARMACY = "pharmacy"
+
+# Hops allowed by TransferTracker.onlyValidTransfer
+VALID_TRANSITIONS = {
+    (MANUFACTURER, WHOLESALER),
+    (WHOLESALER, PHARMACY),
+}
+
+# Score deductions per finding
+PENALTIES = {
+    "empty": 1.0,
+    "broken_chain": 0.4,
+    "invalid_transition": 0.4,
+    "not_from_manufacturer": 0.3,
+    "out_of_order": 0.2,
+    "time_gap": 0.1,
+    "unverified": 0.1,
+}
+
+def _describe(role_set):
+    return "/".join(sorted(role_set)) or "party with no role"
+
+def check_custody(history, roles=None, max_gap_days=30, pass_score=0.8, fail_score=0.4):
+    """
+    Deterministic chain-of-custody checks over a transfer history
+
+    Checks that each hop picks up where the previous one ended, that the
+    chain starts at a manufacturer, that every hop is a role transition the
+    TransferTracker contract allows, that timestamps are ordered without long
+    gaps, and that every transfer was verified. Findings are turned into an
+    authenticity score.
+
+    Args:
+        history: Transfers as returned by get_medication_history, oldest first
+        roles: Mapping of address to the set of role names it holds;
+            addresses missing from it make the role checks unknown
+        max_gap_days: Longest allowed gap between consecutive transfers
+        pass_score: Score at or above which a complete result is authentic
+        fail_score: Score at or below which the product is not authentic
+
+    Returns:
+        dict: Result in the same shape as the Gemini verification, plus
+              `conclusive` (False when a model should take a closer look)
+              and the individual `checks`
+    """
+    roles = roles or {}
+    issues = []
+    deductions = 0.0
+
+    def flag(kind, message):
+        nonlocal deductions
+        issues.append(message)
+        deductions += PENALTIES[kind]
+
+    if not history:
+        flag("empty", "No transfer history recorded on-chain")
+
+    roles_known = all(
+        transfer["from"] in roles and transfer["to"] in roles for transfer in history
+    )
+
+    previous = None
+    for i, transfer in enumerate(history, start=1):
+        if previous is not None and transfer["from"] != previous["to"]:
+            flag("broken_chain", f"Transfer {i} starts at {transfer['from']} but transfer {i - 1} ended at {previous['to']}")
+
+        # An address may hold several roles; like onlyValidTransfer, a hop
+        # is allowed if any pair of the parties' roles is a valid transition
+        from_roles = roles.get(transfer["from"])
+        to_roles = roles.get(transfer["to"])
+        if i == 1 and from_roles is not None and MANUFACTURER not in from_roles:
+            flag("not_from_manufacturer", f"Chain starts at a {_describe(from_roles)}, not a manufacturer")
+        if from_roles is not None and to_roles is not None and not any(
+            (from_role, to_role) in VALID_TRANSITIONS for from_role in from_roles for to_role in to_roles
+        ):
+            flag("invalid_transition", f"Transfer {i} goes from {_describe(from_roles)} to {_describe(to_roles)}, which the contract does not allow")
+
+        if not transfer.get("verified", False):
+            flag("unverified", f"Transfer {i} is not verified")
+
+        if previous is not None:
+            gap = datetime.fromisoformat(transfer["timestamp"]) - datetime.fromisoformat(previous["timestamp"])
+            if gap.total_seconds() < 0:
+                flag("out_of_order", f"Transfer {i} is timestamped before transfer {i - 1}")
+            elif gap.days > max_gap_days:
+                flag("time_gap", f"{gap.days}-day gap before transfer {i}")
+
+        previous = transfer
+
+    score = max(0.0, 1.0 - deductions)
+    if score <= fail_score:
+        is_authentic, conclusive = False, True
+    elif score >= pass_score and roles_known:
+        is_authentic, conclusive = True, True
+    else:
+        # Borderline score, or roles we could not check: let the model decide
+        is_authentic, conclusive = score >= pass_score, False
+
+    recommendations = []
+    if not roles_known and history:
+        recommendations.append("Confirm the roles of all parties in the custody chain")
+    if issues:
+        recommendations.append("Review the flagged transfers with the distributor before dispensing")
+
+    return {
+        "isAuthentic": is_authentic,
+        "authenticityScore": round(score, 3),
+        "issues": issues,
+        "recommendations": recommendations,
+        "source": "rules",
+        "conclusive": conclusive,
+        "checks": {
+            "transferCount": len(history),
+            "rolesKnown": roles_known,
+            "chainStartsAtManufacturer": bool(history) and MANUFACTURER in roles.get(history[0]["from"], ())
+        }
+    }
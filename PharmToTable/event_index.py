@@ -0,0 +1,479 @@
+# event_index.py
+import asyncio
+import base64
+import logging
+import sqlite3
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transfers (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    lot_number TEXT NOT NULL,
+    from_address TEXT NOT NULL,
+    to_address TEXT NOT NULL,
+    location TEXT,
+    timestamp INTEGER NOT NULL,
+    verified INTEGER NOT NULL,
+    transaction_hash TEXT NOT NULL,
+    block_hash TEXT,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS transfers_by_lot ON transfers (lot_number, block_number, log_index);
+CREATE TABLE IF NOT EXISTS blocks (
+    block_number INTEGER PRIMARY KEY,
+    block_hash TEXT NOT NULL,
+    parent_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block_number INTEGER NOT NULL
+);
+"""
+
+# History entry fields, in response order, and the index column each is built from
+HISTORY_FIELDS = {
+    'from': 'from_address',
+    'to': 'to_address',
+    'lotNumber': 'lot_number',
+    'location': 'location',
+    'timestamp': 'timestamp',
+    'verified': 'verified',
+    'transactionHash': 'transaction_hash',
+    'blockNumber': 'block_number',
+    'confirmed': 'block_number'
+}
+
+# Index columns and the decoded transfer keys they hold
+COLUMN_KEYS = {
+    'block_number': 'blockNumber',
+    'log_index': 'logIndex',
+    'lot_number': 'lotNumber',
+    'from_address': 'from',
+    'to_address': 'to',
+    'location': 'location',
+    'timestamp': 'timestamp',
+    'verified': 'verified',
+    'transaction_hash': 'transactionHash',
+    'block_hash': 'blockHash'
+}
+
+class TransferIndex:
+    """
+    SQLite-backed store of decoded Transfer events keyed by lot number
+
+    The checkpoint records the last block whose logs have been fully stored,
+    so an indexer can resume from it after a restart. Headers of blocks that
+    are still within the confirmation depth are kept in `blocks` so a reorg
+    can be detected and rolled back to the last common ancestor.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        # Stores created before reorg tracking lack the block hash column
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(transfers)")}
+        if "block_hash" not in columns:
+            self.conn.execute("ALTER TABLE transfers ADD COLUMN block_hash TEXT")
+
+    def get_checkpoint(self):
+        """
+        Return the last fully indexed block number, or None if nothing is indexed yet
+        """
+        row = self.conn.execute("SELECT block_number FROM checkpoint WHERE id = 0").fetchone()
+        return row["block_number"] if row else None
+
+    def add_transfers(self, transfers, checkpoint, headers=()):
+        """
+        Store decoded transfers and advance the checkpoint in one transaction
+
+        Args:
+            transfers: Iterable of dicts as produced by `decode_transfer`
+            checkpoint: Last block number covered by `transfers`
+            headers: Block headers ({number, hash, parentHash}) to track for
+                reorg detection
+        """
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO transfers (
+                    block_number, log_index, lot_number, from_address, to_address,
+                    location, timestamp, verified, transaction_hash, block_hash
+                ) VALUES (
+                    :blockNumber, :logIndex, :lotNumber, :from, :to,
+                    :location, :timestamp, :verified, :transactionHash, :blockHash
+                )
+                """,
+                list(transfers)
+            )
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO blocks (block_number, block_hash, parent_hash)
+                VALUES (:number, :hash, :parentHash)
+                """,
+                list(headers)
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoint (id, block_number) VALUES (0, ?)",
+                (checkpoint,)
+            )
+
+    def get_block_hash(self, block_number):
+        """
+        Return the tracked hash of a block, or None if it is not tracked
+        """
+        row = self.conn.execute(
+            "SELECT block_hash FROM blocks WHERE block_number = ?",
+            (block_number,)
+        ).fetchone()
+        return row["block_hash"] if row else None
+
+    def get_tracked_blocks(self):
+        """
+        Return tracked (block_number, block_hash) pairs, newest first
+        """
+        rows = self.conn.execute(
+            "SELECT block_number, block_hash FROM blocks ORDER BY block_number DESC"
+        ).fetchall()
+        return [(row["block_number"], row["block_hash"]) for row in rows]
+
+    def rollback(self, block_number):
+        """
+        Discard everything indexed after a block and move the checkpoint back to it
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM transfers WHERE block_number > ?", (block_number,))
+            self.conn.execute("DELETE FROM blocks WHERE block_number > ?", (block_number,))
+            self.conn.execute(
+                "UPDATE checkpoint SET block_number = ? WHERE id = 0 AND block_number > ?",
+                (block_number, block_number)
+            )
+
+    def prune_blocks(self, below):
+        """
+        Stop tracking headers of blocks that are final
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM blocks WHERE block_number < ?", (below,))
+
+    def get_history(self, lot_number, finalized_block=None):
+        """
+        Return the indexed transfer history for a lot, oldest first
+
+        Args:
+            lot_number: Lot number to query
+            finalized_block: Highest block considered final; entries above it
+                are flagged as unconfirmed
+
+        Returns:
+            list: Transfers in the same shape as `get_medication_history`
+        """
+        rows = self.conn.execute(
+            """
+            SELECT * FROM transfers
+            WHERE lot_number = ?
+            ORDER BY block_number, log_index
+            """,
+            (lot_number,)
+        ).fetchall()
+        return [format_transfer(_row_to_transfer(row), finalized_block) for row in rows]
+
+    def get_history_page(self, lot_number, after=None, order="asc", limit=None, fields=None,
+                         finalized_block=None):
+        """
+        Return one page of a lot's indexed history in (blockNumber, logIndex) order
+
+        Only the rows of the page, and only the columns behind `fields`, are
+        read from the index.
+
+        Args:
+            lot_number: Lot number to query
+            after: (blockNumber, logIndex) to continue after, exclusive, in `order`
+            order: "asc" for oldest first or "desc" for newest first
+            limit: Maximum number of transfers, or None for all of them
+            fields: History fields to include, or None for every field
+            finalized_block: Highest block considered final
+
+        Returns:
+            tuple: (transfers, (blockNumber, logIndex) of the last transfer
+                if more follow, else None)
+        """
+        columns = {'block_number', 'log_index'} | {HISTORY_FIELDS[field] for field in fields or HISTORY_FIELDS}
+        direction, beyond = ("DESC", "<") if order == "desc" else ("ASC", ">")
+        query = f"SELECT {', '.join(sorted(columns))} FROM transfers WHERE lot_number = ?"
+        params = [lot_number]
+        if after is not None:
+            # Range on block_number first so the lot index is entered at the cursor
+            query += f" AND block_number {beyond}= ? AND (block_number {beyond} ? OR log_index {beyond} ?)"
+            params += [after[0], after[0], after[1]]
+        query += f" ORDER BY block_number {direction}, log_index {direction}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        transfers = [_row_to_transfer(row) for row in self.conn.execute(query, params)]
+        return format_page(transfers, limit, fields, finalized_block)
+
+    def close(self):
+        self.conn.close()
+
+def decode_transfer(event):
+    """
+    Flatten a decoded Transfer log into the row shape stored by TransferIndex
+    """
+    args = event['args']
+    return {
+        'blockNumber': event['blockNumber'],
+        'logIndex': event['logIndex'],
+        'lotNumber': args['lotNumber'],
+        'from': args['from'],
+        'to': args['to'],
+        'location': args['location'],
+        'timestamp': args['timestamp'],
+        'verified': bool(args['verified']),
+        'transactionHash': event['transactionHash'].hex(),
+        'blockHash': event['blockHash'].hex()
+    }
+
+def format_transfer(transfer, finalized_block=None, fields=None):
+    """
+    Convert a decoded transfer into the API's history entry format
+
+    Entries in blocks above `finalized_block` are flagged as unconfirmed.
+    With `fields`, only those entries are built, in that order.
+    """
+    if fields is not None:
+        return {field: _format_field(transfer, field, finalized_block) for field in fields}
+    return {
+        'from': transfer['from'],
+        'to': transfer['to'],
+        'lotNumber': transfer['lotNumber'],
+        'location': transfer['location'],
+        'timestamp': datetime.fromtimestamp(transfer['timestamp']).isoformat(),
+        'verified': bool(transfer['verified']),
+        'transactionHash': transfer['transactionHash'],
+        'blockNumber': transfer['blockNumber'],
+        'confirmed': finalized_block is not None and transfer['blockNumber'] <= finalized_block
+    }
+
+def _format_field(transfer, field, finalized_block):
+    if field == 'timestamp':
+        return datetime.fromtimestamp(transfer['timestamp']).isoformat()
+    if field == 'verified':
+        return bool(transfer['verified'])
+    if field == 'confirmed':
+        return finalized_block is not None and transfer['blockNumber'] <= finalized_block
+    return transfer[field]
+
+def _row_to_transfer(row):
+    # Rows may hold only the columns a page's fields need
+    transfer = {COLUMN_KEYS[column]: row[column] for column in row.keys()}
+    if 'verified' in transfer:
+        transfer['verified'] = bool(transfer['verified'])
+    return transfer
+
+def paginate_transfers(transfers, after=None, order="asc", limit=None):
+    """
+    Apply a page's cursor, order and limit to decoded transfers
+
+    For history sources that cannot filter themselves. One transfer beyond
+    `limit` is kept so `format_page` can tell whether more follow.
+    """
+    position = lambda transfer: (transfer['blockNumber'], transfer['logIndex'])
+    transfers = sorted(transfers, key=position, reverse=order == "desc")
+    if after is not None:
+        if order == "desc":
+            transfers = [transfer for transfer in transfers if position(transfer) < after]
+        else:
+            transfers = [transfer for transfer in transfers if position(transfer) > after]
+    return transfers if limit is None else transfers[:limit + 1]
+
+def format_page(transfers, limit, fields=None, finalized_block=None):
+    """
+    Format a page fetched with up to `limit + 1` transfers
+
+    Returns:
+        tuple: (history entries, (blockNumber, logIndex) of the last entry
+            if more follow, else None)
+    """
+    next_position = None
+    if limit is not None and len(transfers) > limit:
+        transfers = transfers[:limit]
+        next_position = (transfers[-1]['blockNumber'], transfers[-1]['logIndex'])
+    return [format_transfer(transfer, finalized_block, fields) for transfer in transfers], next_position
+
+def encode_cursor(position):
+    """
+    Encode a (blockNumber, logIndex) position as an opaque page cursor
+    """
+    block_number, log_index = position
+    return base64.urlsafe_b64encode(f"{block_number}:{log_index}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Decode a page cursor back into (blockNumber, logIndex)
+
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        block_number, log_index = text.split(":")
+        return int(block_number), int(log_index)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+class ReorgDetected(Exception):
+    """
+    Raised when fetched data no longer links up with the indexed chain
+    """
+
+class TransferIndexer:
+    """
+    Background task that tails Transfer logs into a TransferIndex
+
+    Blocks deeper than `confirmations` below the head are treated as final.
+    Newer blocks are indexed too, but their headers are tracked so that a
+    reorg is detected (by a hash or parent-hash mismatch) and the index is
+    rolled back to the last common ancestor instead of being rescanned.
+
+    Args:
+        index: TransferIndex to write into
+        fetch_logs: async callable (from_block, to_block) -> list of decoded logs
+        get_block_number: async callable returning the current chain head
+        get_block: async callable (block_number) -> {number, hash, parentHash},
+            or None if the block does not exist
+        start_block: First block to index when the store is empty
+        poll_interval: Seconds to sleep once caught up with the head
+        batch_blocks: Number of blocks fetched before each checkpoint commit
+        confirmations: Depth below the head at which blocks are final
+        on_change: Optional callable notified with the set of lot numbers that
+            received new events, or None when a rollback touched every lot
+    """
+
+    def __init__(self, index, fetch_logs, get_block_number, get_block, start_block=0,
+                 poll_interval=5.0, batch_blocks=50000, confirmations=12, on_change=None):
+        self.index = index
+        self.fetch_logs = fetch_logs
+        self.get_block_number = get_block_number
+        self.get_block = get_block
+        self.start_block = start_block
+        self.poll_interval = poll_interval
+        self.batch_blocks = batch_blocks
+        self.confirmations = confirmations
+        self.on_change = on_change
+        self.head = None
+        self.finalized_block = None
+        self.ready = False
+        self._task = None
+
+    async def _handle_reorg(self):
+        """
+        Compare tracked headers with the chain and roll back past any fork
+        """
+        tracked = self.index.get_tracked_blocks()
+        for block_number, block_hash in tracked:
+            block = await self.get_block(block_number)
+            if block is not None and block['hash'] == block_hash:
+                if block_number != tracked[0][0]:
+                    logger.warning("Chain reorg detected; rolling back index to block %s", block_number)
+                    self.index.rollback(block_number)
+                    self._notify(None)
+                return
+
+        if tracked:
+            # The fork is deeper than anything tracked; drop the whole unconfirmed window
+            oldest = tracked[-1][0]
+            logger.error("Reorg deeper than tracked headers; rolling back index to block %s", oldest - 1)
+            self.index.rollback(oldest - 1)
+            self._notify(None)
+
+    def _notify(self, lot_numbers):
+        if self.on_change is not None:
+            self.on_change(lot_numbers)
+
+    async def _fetch_headers(self, from_block, to_block):
+        headers = await asyncio.gather(*(
+            self.get_block(block_number) for block_number in range(from_block, to_block + 1)
+        ))
+
+        # Each header must extend the previously indexed one
+        parent_hash = self.index.get_block_hash(from_block - 1)
+        for header in headers:
+            if header is None:
+                raise ReorgDetected("Block disappeared while indexing")
+            if parent_hash is not None and header['parentHash'] != parent_hash:
+                raise ReorgDetected(f"Parent hash mismatch at block {header['number']}")
+            parent_hash = header['hash']
+        return headers
+
+    async def sync_once(self):
+        """
+        Index every block between the checkpoint and the current head
+        """
+        head = await self.get_block_number()
+        await self._handle_reorg()
+        checkpoint = self.index.get_checkpoint()
+        next_block = self.start_block if checkpoint is None else checkpoint + 1
+        safe_head = head - self.confirmations
+
+        while next_block <= head:
+            to_block = min(next_block + self.batch_blocks - 1, head)
+            logs = await self.fetch_logs(next_block, to_block)
+            transfers = [decode_transfer(log) for log in logs]
+
+            # Only blocks that could still be reorged need their headers tracked
+            headers = []
+            first_unconfirmed = max(next_block, safe_head + 1)
+            if first_unconfirmed <= to_block:
+                headers = await self._fetch_headers(first_unconfirmed, to_block)
+                hashes = {header['number']: header['hash'] for header in headers}
+                for transfer in transfers:
+                    expected = hashes.get(transfer['blockNumber'])
+                    if expected is not None and transfer['blockHash'] != expected:
+                        raise ReorgDetected(f"Log block hash mismatch at block {transfer['blockNumber']}")
+
+            self.index.add_transfers(transfers, to_block, headers)
+            if transfers:
+                self._notify({transfer['lotNumber'] for transfer in transfers})
+            next_block = to_block + 1
+
+        # Keep the newest final header as the anchor for future reorg checks
+        self.index.prune_blocks(safe_head)
+        self.head = head
+        self.finalized_block = safe_head
+        self.ready = True
+
+    async def run(self):
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except ReorgDetected as e:
+                logger.warning("Chain changed during indexing (%s); resyncing", e)
+            except Exception:
+                logger.exception("Transfer indexer sync failed; retrying")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
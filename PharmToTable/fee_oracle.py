@@ -0,0 +1,132 @@
+# fee_oracle.py
+import asyncio
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+def call_shape(contract_function):
+    """
+    Structural key for a contract call: calls with the same key cost the same gas
+
+    Strings and bytes are keyed by the number of 32-byte words they occupy and
+    integers by whether they are zero, which is what drives calldata and
+    storage costs.
+    """
+    shape = []
+    for arg in contract_function.args:
+        if isinstance(arg, str):
+            shape.append(('words', math.ceil(len(arg.encode('utf-8')) / 32)))
+        elif isinstance(arg, (bytes, bytearray)):
+            shape.append(('words', math.ceil(len(arg) / 32)))
+        elif isinstance(arg, bool):
+            shape.append(('bool', arg))
+        elif isinstance(arg, int):
+            shape.append(('int', arg != 0))
+        else:
+            shape.append((type(arg).__name__, None))
+    return (contract_function.fn_name, tuple(shape))
+
+class FeeOracle:
+    """
+    Cached fee suggestions and gas estimates for outgoing transactions
+
+    A single background poller refreshes the base fee and priority fee once
+    per new block, so building a transaction needs no fee RPCs. Gas estimates
+    are cached per call shape (see `call_shape`) and padded by a safety margin.
+    Chains without EIP-1559 fall back to a cached legacy gas price.
+
+    Args:
+        w3: AsyncWeb3 instance
+        poll_interval: Seconds between fee refreshes
+        gas_margin: Fractional headroom added to gas estimates
+        base_fee_multiplier: Max fee is base fee times this plus the priority fee
+    """
+
+    def __init__(self, w3, poll_interval=3.0, gas_margin=0.2, base_fee_multiplier=2):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.gas_margin = gas_margin
+        self.base_fee_multiplier = base_fee_multiplier
+        self.block_number = None
+        self.base_fee = None
+        self.priority_fee = None
+        self.gas_price = None
+        self._gas_estimates = {}
+        self._ready = asyncio.Event()
+        self._task = None
+
+    async def refresh(self):
+        """
+        Fetch fee data for the latest block if it has changed since the last poll
+        """
+        block = await self.w3.eth.get_block('latest')
+        if block['number'] == self.block_number:
+            return
+
+        base_fee = block.get('baseFeePerGas')
+        if base_fee is not None:
+            self.priority_fee = await self.w3.eth.max_priority_fee
+            self.gas_price = None
+        else:
+            self.gas_price = await self.w3.eth.gas_price
+            self.priority_fee = None
+        self.base_fee = base_fee
+        self.block_number = block['number']
+        self._ready.set()
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Fee oracle refresh failed; keeping previous fees")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def fee_params(self):
+        """
+        Return fee fields for a transaction from the cached block data
+
+        Returns:
+            dict: maxFeePerGas/maxPriorityFeePerGas, or gasPrice on legacy chains
+        """
+        if not self._ready.is_set():
+            # Only the first write after start-up waits for the poller
+            await self.refresh()
+
+        if self.base_fee is None:
+            return {'gasPrice': self.gas_price}
+        return {
+            'maxFeePerGas': self.base_fee * self.base_fee_multiplier + self.priority_fee,
+            'maxPriorityFeePerGas': self.priority_fee
+        }
+
+    async def estimate_gas(self, contract_function, from_address):
+        """
+        Return a padded gas limit for a call, reusing estimates for identical shapes
+
+        Args:
+            contract_function: Bound contract function to estimate
+            from_address: Sender used for the estimate
+        """
+        key = call_shape(contract_function)
+        if key not in self._gas_estimates:
+            estimate = await contract_function.estimate_gas({'from': from_address})
+            self._gas_estimates[key] = int(estimate * (1 + self.gas_margin))
+        return self._gas_estimates[key]
@@ -444,7 +444,8 @@ elif page == "Batch Processing":
                             # Display result
                             st.success(f"Batch processing started: {result.get('message')}")
                             st.info(f"Total records: {result.get('total_records')}")
-                            st.warning("Processing will continue in the background. Results will be saved to batch_results.csv when complete.")
+                            st.info(f"Job ID: {result.get('jobId')}")
+                            st.warning(f"Processing will continue in the background. Track progress at {API_URL}/api/batch/{result.get('jobId')} and fetch results from /results when complete.")
                         except Exception as e:
                             st.error(f"Error processing batch: {str(e)}")
         except Exception as e:
@@ -1,10 +1,253 @@
 # gemini_helpers.py
+import asyncio
 import base64
 import json
-from io import BytesIO
-from PIL import Image
-from config import model
-import google.generativeai as genai
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    LLM_BACKEND,
+    GEMINI_API_KEY,
+    GEMINI_MODEL_NAME,
+    LLM_STUB_LATENCY_MS,
+    LLM_STUB_JITTER_MS,
+    LLM_STUB_RESPONSES_PATH,
+    LLM_RECORDINGS_DIR,
+    LLM_CACHE_DIR,
+    LLM_CACHE_MEMORY_BYTES,
+    LLM_CACHE_DISK_BYTES,
+    LLM_CACHE_TTLS,
+    GEMINI_MAX_IN_FLIGHT,
+    GEMINI_RESERVED_INTERACTIVE,
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_TOKENS_PER_MINUTE,
+    CUSTODY_MAX_GAP_DAYS,
+    CUSTODY_PASS_SCORE,
+    CUSTODY_FAIL_SCORE,
+    LEDGER_MAP_CONCURRENCY,
+    LEDGER_GAP_DAYS,
+    IMAGE_MAX_PIXELS,
+    PROMPT_HISTORY_TOKEN_BUDGET,
+    GEMINI_BATCH_TOKEN_BUDGET,
+    GEMINI_BATCH_MAX_LOTS,
+    GEMINI_BATCH_RETRIES,
+    GEMINI_BATCH_HISTORY_TOKEN_BUDGET
+)
+from llm_cache import ResponseCache, make_key
+from custody_rules import check_custody
+from ledger_pipeline import LedgerStats
+from image_ingest import prepare_image
+from prompt_builder import estimate_tokens, compact_json, serialize_history
+from rate_limiter import ModelLimiter
+from llm_backends import create_backend
+from single_flight import SingleFlight
+
+# Bump a helper's version whenever its prompt template changes so stale
+# cached responses are never served for the new prompt
+PROMPT_VERSIONS = {
+    "process_document_image": 1,
+    "analyze_ledger_data": 1,
+    "analyze_ledger_chunk": 2,
+    "summarize_ledger": 2,
+    "verify_medication": 4,
+    "verify_medication_batch": 1,
+    "generate_journey_visualization": 2,
+    "narrate_journey": 3
+}
+
+# Gemini, the local stub, or record/replay, as selected by LLM_BACKEND; the
+# backend's model name is part of every cache key so stub replies never
+# stand in for real ones
+backend = create_backend(
+    LLM_BACKEND,
+    api_key=GEMINI_API_KEY,
+    model_name=GEMINI_MODEL_NAME,
+    stub_latency_ms=LLM_STUB_LATENCY_MS,
+    stub_jitter_ms=LLM_STUB_JITTER_MS,
+    stub_responses_path=LLM_STUB_RESPONSES_PATH,
+    recordings_dir=LLM_RECORDINGS_DIR
+)
+
+# Responses for byte-identical inputs are served from here instead of the model
+response_cache = ResponseCache(
+    LLM_CACHE_DIR,
+    memory_bytes=LLM_CACHE_MEMORY_BYTES,
+    disk_bytes=LLM_CACHE_DISK_BYTES
+)
+
+# Backend calls block, so they run on a bounded pool behind a shared limiter
+_model_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_IN_FLIGHT, thread_name_prefix="gemini")
+model_limiter = ModelLimiter(
+    max_in_flight=GEMINI_MAX_IN_FLIGHT,
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+    reserved_interactive=GEMINI_RESERVED_INTERACTIVE
+)
+
+logger = logging.getLogger(__name__)
+
+# Identical prompts already in flight are joined rather than sent again
+_model_calls = SingleFlight()
+
+# Per-helper token and latency totals for calls that reached the model
+_usage = {}
+
+def _record_usage(helper, estimated_tokens, response_text, seconds, metadata=None):
+    prompt_tokens = getattr(metadata, "prompt_token_count", None) or estimated_tokens
+    response_tokens = getattr(metadata, "candidates_token_count", None)
+    if response_tokens is None:
+        response_tokens = estimate_tokens(response_text)
+    
+    usage = _usage.setdefault(helper, {"calls": 0, "promptTokens": 0, "responseTokens": 0, "seconds": 0.0})
+    usage["calls"] += 1
+    usage["promptTokens"] += prompt_tokens
+    usage["responseTokens"] += response_tokens
+    usage["seconds"] += seconds
+    logger.debug("%s: %d prompt tokens, %d response tokens, %.2fs", helper, prompt_tokens, response_tokens, seconds)
+
+async def _call_model(contents, helper="unknown"):
+    """
+    Run generate_content off the event loop once the limiter admits the call
+    """
+    tokens = estimate_tokens(contents)
+    async with model_limiter.slot(tokens):
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        response = await loop.run_in_executor(_model_executor, backend.generate, contents, helper)
+    _record_usage(
+        helper, tokens, response.text, time.monotonic() - started,
+        getattr(response, "usage_metadata", None)
+    )
+    return response
+
+async def _stream_model(contents, helper="unknown"):
+    """
+    Stream generate_content text chunks as Gemini produces them
+    
+    The blocking stream is consumed on the model pool and handed to the
+    event loop chunk by chunk. If the consumer goes away (e.g. the SSE
+    client disconnects), the stream is abandoned at the next chunk, and the
+    limiter slot is held until the pool thread has stopped.
+    """
+    tokens = estimate_tokens(contents)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    finished = object()
+    stop = threading.Event()
+    
+    def produce():
+        stream = backend.stream(contents, helper)
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+    
+    parts = []
+    async with model_limiter.slot(tokens):
+        started = time.monotonic()
+        producer = loop.run_in_executor(_model_executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                parts.append(item)
+                yield item
+        finally:
+            stop.set()
+            await asyncio.wait([producer])
+    _record_usage(helper, tokens, "".join(parts), time.monotonic() - started)
+
+def get_llm_usage_stats():
+    """
+    Return per-helper call counts, token totals and model time
+    """
+    return {helper: dict(usage) for helper, usage in _usage.items()}
+
+def get_llm_cache_stats():
+    """
+    Return hit/miss counters for the Gemini response cache
+    """
+    return response_cache.stats()
+
+async def _generate_json(helper, inputs, contents):
+    """
+    Send a prompt to Gemini and parse its JSON reply, serving repeats from cache
+    
+    Concurrent calls with the same cache key share one model call.
+    
+    Args:
+        helper: Name of the calling helper (selects prompt version and TTL)
+        inputs: Everything the prompt is built from, used as the cache key
+        contents: Prompt contents passed to generate_content
+        
+    Returns:
+        dict: Parsed JSON, or an error dict with the raw text
+    """
+    key = make_key(backend.model_name, helper, PROMPT_VERSIONS[helper], inputs)
+    text = await response_cache.get(key)
+    if text is not None:
+        return json.loads(text)
+    
+    # Each caller parses the shared text so results can be modified independently
+    text = await _model_calls.do(key, _generate_text, helper, key, contents)
+    
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return {"error": "Invalid JSON response", "raw_text": text}
+
+async def _generate_text(helper, key, contents):
+    response = await _call_model(contents, helper)
+    try:
+        json.loads(response.text)
+    except json.JSONDecodeError:
+        # Unparseable replies are not cached so the next call can retry
+        return response.text
+    
+    await response_cache.set(key, response.text, LLM_CACHE_TTLS[helper])
+    return response.text
+
+async def _stream_json(helper, inputs, contents):
+    """
+    Streaming counterpart of _generate_json
+    
+    Yields:
+        tuple: ("delta", text) for each chunk of the reply (a cached reply
+               arrives as a single delta), then ("result", dict) with the
+               parsed JSON or an error dict
+    """
+    key = make_key(backend.model_name, helper, PROMPT_VERSIONS[helper], inputs)
+    text = await response_cache.get(key)
+    if text is not None:
+        yield "delta", text
+        yield "result", json.loads(text)
+        return
+    
+    parts = []
+    async for part in _stream_model(contents, helper):
+        parts.append(part)
+        yield "delta", part
+    text = "".join(parts)
+    
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        yield "result", {"error": "Invalid JSON response", "raw_text": text}
+        return
+    
+    await response_cache.set(key, text, LLM_CACHE_TTLS[helper])
+    yield "result", result
 
 def encode_image(image_path):
     """
@@ -13,24 +256,23 @@ def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode("utf-8")
 
-async def process_document_image(image_path):
+async def process_document_image(image):
     """
     Extract pharmaceutical data from document image
     
     Args:
-        image_path: Path to the document image
+        image: Raw image bytes, or a path to the document image
         
     Returns:
         dict: Extracted pharmaceutical data
     """
     try:
-        # Load and encode the image
-        img = Image.open(image_path)
+        if not isinstance(image, (bytes, bytearray)):
+            with open(image, "rb") as image_file:
+                image = image_file.read()
         
-        # Create a BytesIO object to hold the image data
-        buffer = BytesIO()
-        img.save(buffer, format=img.format)
-        buffer.seek(0)
+        # Sniff the real format and only decode images above the pixel budget
+        image_bytes, mime_type = prepare_image(image, IMAGE_MAX_PIXELS)
         
         # Create prompt for document parsing
         prompt = """
@@ -60,18 +302,11 @@ async def process_document_image(image_path):
         """
         
         # Send multimodal request to Gemini
-        response = model.generate_content(
-            [prompt, {"mime_type": "image/jpeg", "data": buffer.getvalue()}]
+        return await _generate_json(
+            "process_document_image",
+            {"image": image, "maxPixels": IMAGE_MAX_PIXELS},
+            [prompt, {"mime_type": mime_type, "data": image_bytes}]
         )
-        
-        # Parse the response
-        try:
-            # Try to parse as valid JSON
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            # If not valid JSON, extract it from the text
-            return {"error": "Invalid JSON response", "raw_text": response.text}
             
     except Exception as e:
         return {"error": str(e)}
@@ -101,63 +336,397 @@ async def analyze_ledger_data(ledger_content):
         Format your response as JSON with these sections.
         """
         
-        response = model.generate_content(prompt)
+        return await _generate_json("analyze_ledger_data", {"ledger": ledger_content}, prompt)
+            
+    except Exception as e:
+        return {"error": str(e)}
+
+async def analyze_ledger_chunk(digest):
+    """
+    Look for anomalies in the statistics of one ledger chunk
+    
+    Args:
+        digest: Chunk digest from LedgerStats.add_chunk
         
-        try:
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON response", "raw_text": response.text}
+    Returns:
+        dict: Findings for the chunk
+    """
+    try:
+        prompt = f"""
+        These statistics summarize one chunk of a pharmaceutical supply chain ledger:
+        {compact_json(digest)}
+        
+        Identify suspicious patterns, incomplete supply chains and unusual time gaps.
+        
+        Return JSON with fields:
+        {{
+          "anomalies": list of strings,
+          "incompleteChains": list of lot numbers,
+          "timeGaps": list of strings
+        }}
+        """
+        
+        return await _generate_json("analyze_ledger_chunk", {"digest": digest}, prompt)
+            
+    except Exception as e:
+        return {"error": str(e)}
+
+async def summarize_ledger(statistics, findings):
+    """
+    Combine ledger-wide statistics and per-chunk findings into one analysis
+    
+    Args:
+        statistics: Output of LedgerStats.summary
+        findings: Per-chunk results of analyze_ledger_chunk
+        
+    Returns:
+        dict: Analysis results
+    """
+    try:
+        prompt = f"""
+        Ledger-wide statistics for a pharmaceutical supply chain ledger (computed exactly):
+        {compact_json(statistics)}
+        
+        Findings from analyzing each chunk of the ledger:
+        {compact_json(findings)}
+        
+        Provide:
+        1. A summary of all transfers (count, total units, etc.)
+        2. Identify any suspicious patterns or anomalies
+        3. List any medications with incomplete supply chains
+        4. Flag any unusual time gaps between transfers
+        5. Provide recommendations for improving traceability
+        
+        Format your response as JSON with these sections.
+        """
+        
+        return await _generate_json("summarize_ledger", {"statistics": statistics, "findings": findings}, prompt)
+            
+    except Exception as e:
+        return {"error": str(e)}
+
+async def analyze_ledger_stream(chunks):
+    """
+    Map-reduce analysis of a ledger streamed as DataFrame chunks
+    
+    Statistics are computed locally as chunks are read; each chunk's compact
+    digest is sent to Gemini while the next chunk is parsed, and a final
+    call combines the findings. Only one chunk and the per-lot aggregates
+    are held in memory.
+    
+    Args:
+        chunks: Iterator of DataFrames, e.g. from read_ledger_chunks
+        
+    Returns:
+        dict: Analysis results plus the exact local `statistics`
+    """
+    try:
+        stats = LedgerStats(gap_days=LEDGER_GAP_DAYS)
+        semaphore = asyncio.Semaphore(LEDGER_MAP_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        
+        async def map_chunk(index, digest):
+            try:
+                result = await analyze_ledger_chunk(digest)
+            finally:
+                semaphore.release()
+            return {"chunk": index, **result}
+        
+        def next_digest():
+            chunk = next(chunks, None)
+            return None if chunk is None else stats.add_chunk(chunk)
+        
+        tasks = []
+        while True:
+            # Parsing and per-lot aggregation block, so they run off the
+            # event loop; the semaphore stops reading ahead of the model calls
+            await semaphore.acquire()
+            digest = await loop.run_in_executor(None, next_digest)
+            if digest is None:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(map_chunk(len(tasks), digest)))
+        
+        findings = await asyncio.gather(*tasks)
+        statistics = stats.summary()
+        result = await summarize_ledger(statistics, [f for f in findings if "error" not in f])
+        result["statistics"] = statistics
+        return result
             
     except Exception as e:
         return {"error": str(e)}
 
-async def verify_medication(medication_data, blockchain_data):
+def _verification_prompt(medication_data, blockchain_data):
+    """
+    Build the single-product verification prompt
+    """
+    history_table, _ = serialize_history(blockchain_data, PROMPT_HISTORY_TOKEN_BUDGET, CUSTODY_MAX_GAP_DAYS)
+    return f"""
+    Verify the authenticity of this pharmaceutical product:
+    
+    Current scan data:
+    {compact_json(medication_data)}
+    
+    Supply chain history from blockchain (one row per transfer, oldest first):
+    {history_table}
+    
+    Analyze:
+    1. Is there a complete chain of custody from manufacturer to current point?
+    2. Are there any suspicious time gaps or location jumps?
+    3. Does the product data match what was recorded at manufacturing?
+    4. Calculate an authenticity score based on these factors.
+    
+    Return JSON with fields: 
+    {{
+      "isAuthentic": boolean,
+      "authenticityScore": number (0-1),
+      "issues": list of strings,
+      "recommendations": list of strings
+    }}
+    """
+
+async def verify_medication(medication_data, blockchain_data, roles=None, deep=False):
     """
     Verify medication authenticity based on data and blockchain history
     
+    The local custody rules run first; Gemini is only asked when they are
+    inconclusive or a deep verification is requested.
+    
     Args:
         medication_data: Data about the medication
         blockchain_data: History from blockchain
+        roles: Optional mapping of address to supply-chain role
+        deep: Always consult Gemini, even if the rules are conclusive
         
     Returns:
         dict: Verification results
     """
     try:
-        prompt = f"""
-        Verify the authenticity of this pharmaceutical product:
+        rule_result = check_custody(
+            blockchain_data,
+            roles,
+            max_gap_days=CUSTODY_MAX_GAP_DAYS,
+            pass_score=CUSTODY_PASS_SCORE,
+            fail_score=CUSTODY_FAIL_SCORE
+        )
+        if rule_result["conclusive"] and not deep:
+            return rule_result
         
-        Current scan data:
-        {json.dumps(medication_data, indent=2)}
+        prompt = _verification_prompt(medication_data, blockchain_data)
         
-        Supply chain history from blockchain:
-        {json.dumps(blockchain_data, indent=2)}
+        result = await _generate_json("verify_medication", {"medication": medication_data, "history": blockchain_data}, prompt)
+        result["ruleChecks"] = rule_result
+        return result
+            
+    except Exception as e:
+        return {"error": str(e)}
+
+async def verify_medication_stream(medication_data, blockchain_data, roles=None, deep=False):
+    """
+    Streaming variant of verify_medication
+    
+    Yields:
+        tuple: ("rules", dict) with the custody rule result, then, if Gemini
+               is consulted, ("delta", text) chunks of its reply, and finally
+               ("result", dict) with the same value verify_medication returns
+    """
+    try:
+        rule_result = check_custody(
+            blockchain_data,
+            roles,
+            max_gap_days=CUSTODY_MAX_GAP_DAYS,
+            pass_score=CUSTODY_PASS_SCORE,
+            fail_score=CUSTODY_FAIL_SCORE
+        )
+        yield "rules", rule_result
+        if rule_result["conclusive"] and not deep:
+            yield "result", rule_result
+            return
         
-        Analyze:
+        async for event, data in _stream_json(
+            "verify_medication",
+            {"medication": medication_data, "history": blockchain_data},
+            _verification_prompt(medication_data, blockchain_data)
+        ):
+            if event == "result":
+                data["ruleChecks"] = rule_result
+            yield event, data
+            
+    except Exception as e:
+        yield "result", {"error": str(e)}
+
+def _valid_verification(item):
+    """
+    Check that a per-lot verification from a batched reply is usable
+    """
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("isAuthentic"), bool)
+        and isinstance(item.get("authenticityScore"), (int, float))
+        and 0 <= item["authenticityScore"] <= 1
+        and isinstance(item.get("issues", []), list)
+        and isinstance(item.get("recommendations", []), list)
+    )
+
+def _pack_verifications(pending, blocks):
+    """
+    Group pending items into requests that fit the batch token budget
+    
+    A lot number appears at most once per request so replies can be
+    matched back by lot.
+    """
+    groups = []
+    current, lots, tokens = [], set(), 0
+    for index in pending:
+        lot, text = blocks[index]
+        block_tokens = estimate_tokens(text)
+        if current and (
+            lot in lots
+            or len(current) >= GEMINI_BATCH_MAX_LOTS
+            or tokens + block_tokens > GEMINI_BATCH_TOKEN_BUDGET
+        ):
+            groups.append(current)
+            current, lots, tokens = [], set(), 0
+        current.append(index)
+        lots.add(lot)
+        tokens += block_tokens
+    if current:
+        groups.append(current)
+    return groups
+
+async def _verify_group(group, blocks):
+    """
+    Send one packed verification request and match results by lot number
+    
+    Returns:
+        dict: Index of each item to its parsed result (malformed or
+              missing items are left out)
+    """
+    products = "\n\n".join(blocks[index][1] for index in group)
+    prompt = f"""
+        Verify the authenticity of each of these pharmaceutical products.
+        Each product has its current scan data and its supply chain history from blockchain
+        (one row per transfer, oldest first).
+        
+        {products}
+        
+        For each product analyze:
         1. Is there a complete chain of custody from manufacturer to current point?
         2. Are there any suspicious time gaps or location jumps?
         3. Does the product data match what was recorded at manufacturing?
         4. Calculate an authenticity score based on these factors.
         
-        Return JSON with fields: 
-        {
-          "isAuthentic": boolean,
-          "authenticityScore": number (0-1),
-          "issues": list of strings,
-          "recommendations": list of strings
-        }
+        Return a JSON array with exactly one object per product:
+        [
+          {{
+            "lotNumber": string,
+            "isAuthentic": boolean,
+            "authenticityScore": number (0-1),
+            "issues": list of strings,
+            "recommendations": list of strings
+          }}
+        ]
         """
+    
+    response = await _call_model(prompt, "verify_medication_batch")
+    try:
+        reply = json.loads(response.text)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(reply, dict):
+        reply = reply.get("results", [])
+    if not isinstance(reply, list):
+        return {}
+    
+    by_lot = {str(item.get("lotNumber")): item for item in reply if isinstance(item, dict)}
+    results = {}
+    for index in group:
+        item = by_lot.get(blocks[index][0])
+        if _valid_verification(item):
+            results[index] = item
+    return results
+
+async def verify_medications_batch(items):
+    """
+    Verify many medications, packing the ones that need Gemini into shared requests
+    
+    Each item goes through the local custody rules first, as in
+    verify_medication. Inconclusive items are packed into as many products
+    per request as GEMINI_BATCH_TOKEN_BUDGET and GEMINI_BATCH_MAX_LOTS allow.
+    Replies are matched back by lot number, and only items whose result is
+    missing or malformed are sent again, up to GEMINI_BATCH_RETRIES times.
+    
+    Args:
+        items: List of (medication_data, blockchain_data, roles) tuples;
+            medication_data must include `lotNumber`
         
-        response = model.generate_content(prompt)
-        
+    Returns:
+        list: Verification result (or error dict) for each item, in order
+    """
+    results = [None] * len(items)
+    blocks = {}
+    keys = {}
+    rule_results = {}
+    
+    for index, (medication_data, blockchain_data, roles) in enumerate(items):
         try:
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON response", "raw_text": response.text}
+            rule_result = check_custody(
+                blockchain_data,
+                roles,
+                max_gap_days=CUSTODY_MAX_GAP_DAYS,
+                pass_score=CUSTODY_PASS_SCORE,
+                fail_score=CUSTODY_FAIL_SCORE
+            )
+            if rule_result["conclusive"]:
+                results[index] = rule_result
+                continue
+            rule_results[index] = rule_result
             
-    except Exception as e:
-        return {"error": str(e)}
+            keys[index] = make_key(
+                backend.model_name,
+                "verify_medication_batch",
+                PROMPT_VERSIONS["verify_medication_batch"],
+                {"medication": medication_data, "history": blockchain_data}
+            )
+            cached = await response_cache.get(keys[index])
+            if cached is not None:
+                results[index] = {**json.loads(cached), "ruleChecks": rule_result}
+                continue
+            
+            history_table, _ = serialize_history(blockchain_data, GEMINI_BATCH_HISTORY_TOKEN_BUDGET, CUSTODY_MAX_GAP_DAYS)
+            # Prompt text for this product, keyed by the lot its reply must name
+            blocks[index] = (
+                str(medication_data["lotNumber"]),
+                f"### Product lotNumber={medication_data['lotNumber']}\n"
+                f"scan: {compact_json(medication_data)}\n"
+                f"{history_table}"
+            )
+        except Exception as e:
+            results[index] = {"error": str(e)}
+    
+    pending = list(blocks)
+    for _ in range(GEMINI_BATCH_RETRIES + 1):
+        if not pending:
+            break
+        groups = _pack_verifications(pending, blocks)
+        replies = await asyncio.gather(
+            *(_verify_group(group, blocks) for group in groups),
+            return_exceptions=True
+        )
+        for group, reply in zip(groups, replies):
+            if isinstance(reply, Exception):
+                # The whole request failed; leave its items for the next round
+                logger.warning("Batched verification request failed: %s", reply)
+                continue
+            for index, item in reply.items():
+                result = {key: item[key] for key in ("isAuthentic", "authenticityScore", "issues", "recommendations") if key in item}
+                await response_cache.set(keys[index], json.dumps(result), LLM_CACHE_TTLS["verify_medication_batch"])
+                results[index] = {**result, "ruleChecks": rule_results[index]}
+        pending = [index for index in pending if results[index] is None]
+    
+    for index in pending:
+        results[index] = {"error": "No valid verification returned for this lot", "ruleChecks": rule_results[index]}
+    return results
 
 async def generate_journey_visualization(blockchain_data):
     """
@@ -170,9 +739,10 @@ async def generate_journey_visualization(blockchain_data):
         dict: Visualization data
     """
     try:
+        history_table, _ = serialize_history(blockchain_data, PROMPT_HISTORY_TOKEN_BUDGET, CUSTODY_MAX_GAP_DAYS)
         prompt = f"""
-        Generate a journey map from these pharmaceutical supply chain records:
-        {json.dumps(blockchain_data, indent=2)}
+        Generate a journey map from these pharmaceutical supply chain records (one row per transfer, oldest first):
+        {history_table}
         
         For each transfer point, calculate:
         1. Time in transit
@@ -189,13 +759,55 @@ async def generate_journey_visualization(blockchain_data):
         }}
         """
         
-        response = model.generate_content(prompt)
+        return await _generate_json("generate_journey_visualization", {"history": blockchain_data}, prompt)
+            
+    except Exception as e:
+        return {"error": str(e)}
+
+def _narration_prompt(journey):
+    """
+    Build the journey narration prompt
+    """
+    return f"""
+    These metrics describe a pharmaceutical product's journey through the supply chain.
+    Distances, transit times and risk scores are already computed; do not recompute them.
+    
+    {compact_json(journey)}
+    
+    Summarize the journey for a pharmacist and point out the transfers that deserve attention.
+    
+    Return JSON with fields:
+    {{
+      "narrative": string,
+      "concerns": list of strings
+    }}
+    """
+
+async def narrate_journey(journey):
+    """
+    Describe locally computed journey metrics in plain language
+    
+    Args:
+        journey: Output of journey_metrics.compute_journey
         
-        try:
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON response", "raw_text": response.text}
+    Returns:
+        dict: Narrative and highlighted concerns
+    """
+    try:
+        return await _generate_json("narrate_journey", {"journey": journey}, _narration_prompt(journey))
             
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+async def narrate_journey_stream(journey):
+    """
+    Streaming variant of narrate_journey
+    
+    Yields:
+        tuple: ("delta", text) chunks of the reply, then ("result", dict)
+    """
+    try:
+        async for event in _stream_json("narrate_journey", {"journey": journey}, _narration_prompt(journey)):
+            yield event
+    except Exception as e:
+        yield "result", {"error": str(e)}
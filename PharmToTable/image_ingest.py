@@ -0,0 +1,54 @@
+# image_ingest.py
+from io import BytesIO
+from PIL import Image
+
+# Formats Gemini accepts inline, by PIL format name
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    # Multi-picture JPEG from phone cameras; the bytes are a valid JPEG
+    "MPO": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "HEIF": "image/heif",
+}
+
+# Formats re-encoded as another format when downscaled
+SAVE_FORMATS = {"MPO": "JPEG"}
+
+def prepare_image(data, max_pixels):
+    """
+    Get uploaded image bytes ready for an inline model request
+
+    Only the image header is parsed to find the format and size. Images
+    within the pixel budget are returned as the original bytes object,
+    without decoding or copying; larger ones are downscaled to fit and
+    re-encoded in their own format.
+
+    Args:
+        data: Raw image bytes
+        max_pixels: Largest width * height sent as-is
+
+    Returns:
+        tuple: (bytes, MIME type)
+    """
+    with Image.open(BytesIO(data)) as img:
+        image_format = img.format
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported image format: {image_format}")
+
+        width, height = img.size
+        if width * height <= max_pixels:
+            return data, MIME_TYPES[image_format]
+
+        scale = (max_pixels / (width * height)) ** 0.5
+        # JPEG can decode straight to a smaller size, skipping most of the work
+        img.draft(img.mode, (int(width * scale), int(height * scale)))
+        img.thumbnail((max(1, int(width * scale)), max(1, int(height * scale))))
+        save_format = SAVE_FORMATS.get(image_format, image_format)
+        if save_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        buffer = BytesIO()
+        img.save(buffer, format=save_format)
+        return buffer.getvalue(), MIME_TYPES[image_format]
@@ -0,0 +1,169 @@
+# journey_metrics.py
+import csv
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+def _normalize(location):
+    return " ".join(location.lower().replace(".", "").split())
+
+class GeocodeCache:
+    """
+    Resolve location strings to coordinates from an offline gazetteer
+
+    Resolutions (including misses) are persisted in SQLite so every distinct
+    location string is only matched against the gazetteer once.
+
+    Args:
+        path: SQLite file for the cache
+        gazetteer_path: CSV file with `name,latitude,longitude` columns
+    """
+
+    def __init__(self, path, gazetteer_path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS locations (
+                query TEXT PRIMARY KEY,
+                latitude REAL,
+                longitude REAL
+            )
+            """
+        )
+        self.conn.commit()
+        self.gazetteer = {}
+        if gazetteer_path and os.path.exists(gazetteer_path):
+            with open(gazetteer_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    self.gazetteer[_normalize(row["name"])] = (float(row["latitude"]), float(row["longitude"]))
+
+    def _match(self, query):
+        # Try the full string, then progressively drop trailing ", region" parts
+        parts = [part.strip() for part in query.split(",")]
+        for end in range(len(parts), 0, -1):
+            candidate = ", ".join(parts[:end])
+            if candidate in self.gazetteer:
+                return self.gazetteer[candidate]
+        return None
+
+    def resolve_many(self, locations):
+        """
+        Return a (latitude, longitude) pair, or None, for each location string
+        """
+        queries = [_normalize(location or "") for location in locations]
+        distinct = sorted(set(queries))
+        placeholders = ",".join("?" * len(distinct))
+        cached = {
+            row[0]: (row[1], row[2])
+            for row in self.conn.execute(
+                f"SELECT query, latitude, longitude FROM locations WHERE query IN ({placeholders})",
+                distinct
+            )
+        } if distinct else {}
+
+        new_rows = []
+        for query in distinct:
+            if query not in cached:
+                match = self._match(query)
+                cached[query] = match if match else (None, None)
+                new_rows.append((query, *cached[query]))
+        if new_rows:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO locations VALUES (?, ?, ?)", new_rows)
+
+        return [cached[query] if cached[query][0] is not None else None for query in queries]
+
+    def close(self):
+        self.conn.close()
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between coordinate arrays (degrees), in kilometres
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def compute_journey(history, geocoder, max_gap_days=30, max_speed_kmh=900):
+    """
+    Compute journey map data for a transfer history without calling a model
+
+    Args:
+        history: Transfers as returned by get_medication_history, oldest first
+        geocoder: GeocodeCache used to place each transfer's location
+        max_gap_days: Gap at which the time component of risk saturates
+        max_speed_kmh: Implied speed above which a hop is physically implausible
+
+    Returns:
+        dict: `nodes`, `edges`, `timeData`, `riskScores` and `summary`, the
+              shape rendered by the Streamlit journey page
+    """
+    if not history:
+        return {"nodes": [], "edges": [], "timeData": [], "riskScores": [], "summary": {"totalTransfers": 0}}
+
+    timestamps = np.array([datetime.fromisoformat(t["timestamp"]).timestamp() for t in history])
+    verified = np.array([bool(t.get("verified", False)) for t in history])
+    coordinates = geocoder.resolve_many([t.get("location") for t in history])
+    lat = np.array([c[0] if c else np.nan for c in coordinates])
+    lon = np.array([c[1] if c else np.nan for c in coordinates])
+    located = ~np.isnan(lat)
+
+    # Per-transfer deltas against the previous transfer (zero for the first)
+    hours = np.diff(timestamps, prepend=timestamps[0]) / 3600.0
+    distance = np.zeros(len(history))
+    distance[1:] = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    distance = np.nan_to_num(distance)
+    speed = np.divide(distance, hours, out=np.zeros_like(distance), where=hours > 0)
+
+    risk = (
+        0.4 * np.clip(hours / (max_gap_days * 24.0), 0, 1)
+        + 0.4 * (speed > max_speed_kmh)
+        + 0.4 * (hours < 0)
+        + 0.3 * ~verified
+        + 0.1 * ~located
+    )
+    risk = np.round(np.clip(risk, 0, 1), 3)
+
+    nodes = []
+    node_ids = {}
+    for transfer, coordinate in zip(history, coordinates):
+        name = transfer.get("location") or "Unknown"
+        if name not in node_ids:
+            node_ids[name] = len(nodes)
+            nodes.append({
+                "id": node_ids[name],
+                "name": name,
+                "latitude": coordinate[0] if coordinate else None,
+                "longitude": coordinate[1] if coordinate else None
+            })
+
+    edges = [
+        {
+            "from": node_ids[history[i - 1].get("location") or "Unknown"],
+            "to": node_ids[history[i].get("location") or "Unknown"],
+            "transfer": i,
+            "hoursInTransit": round(float(hours[i]), 2),
+            "distanceKm": round(float(distance[i]), 1),
+            "riskScore": float(risk[i])
+        }
+        for i in range(1, len(history))
+    ]
+
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "timeData": [t["timestamp"] for t in history],
+        "riskScores": risk.tolist(),
+        "summary": {
+            "totalTransfers": len(history),
+            "totalDistanceKm": round(float(distance.sum()), 1),
+            "totalDays": round(float((timestamps[-1] - timestamps[0]) / 86400.0), 2),
+            "maxGapHours": round(float(hours.max()), 2),
+            "averageRisk": round(float(risk.mean()), 3),
+            "highRiskTransfers": int((risk >= 0.7).sum()),
+            "unresolvedLocations": int((~located).sum())
+        }
+    }
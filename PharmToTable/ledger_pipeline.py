@@ -0,0 +1,157 @@
+# ledger_pipeline.py
+import pandas as pd
+
+# Accepted spellings for the ledger columns the statistics rely on
+LOT_COLUMNS = ("lotNumber", "lot_number", "lot", "Lot Number")
+QUANTITY_COLUMNS = ("quantity", "qty", "units", "Quantity")
+TIME_COLUMNS = ("transferDate", "timestamp", "date", "Transfer Date")
+
+def _pick(columns, candidates):
+    for candidate in candidates:
+        if candidate in columns:
+            return candidate
+    return None
+
+def read_ledger_chunks(source, chunk_rows=50000):
+    """
+    Stream a CSV ledger as DataFrames of at most `chunk_rows` rows
+
+    Args:
+        source: Path or binary file object
+        chunk_rows: Rows per chunk
+    """
+    return pd.read_csv(source, chunksize=chunk_rows)
+
+class LedgerStats:
+    """
+    Running ledger statistics computed chunk by chunk
+
+    Only per-lot aggregates (count, last timestamp, largest gap, whether
+    the lot ever went back in time) are kept between chunks, in one frame
+    that each chunk is merged into with vectorized operations. Memory grows
+    with the number of distinct lots, not with the number of rows.
+
+    A lot is out of order if any of its rows is timestamped before the
+    lot's previous row in file order, whether both rows fall in the same
+    chunk or not, so the count does not depend on the chunk size. Gaps
+    across chunk boundaries assume the ledger is in chronological order.
+
+    Args:
+        gap_days: Gap between transfers of one lot that counts as unusual
+    """
+
+    def __init__(self, gap_days=30):
+        self.gap = pd.Timedelta(days=gap_days)
+        self.rows = 0
+        self.units = 0
+        self.missing_lot = 0
+        self.negative_quantity = 0
+        self.unparseable_dates = 0
+        self.columns = None
+        self.lots = pd.DataFrame({
+            "count": pd.Series(dtype="int64"),
+            "last": pd.Series(dtype="datetime64[ns]"),
+            "gap": pd.Series(dtype="timedelta64[ns]"),
+            # Timestamp of the lot's latest row in file order
+            "tail": pd.Series(dtype="datetime64[ns]"),
+            "backwards": pd.Series(dtype="bool")
+        })
+
+    def add_chunk(self, df):
+        """
+        Fold a chunk into the running totals and return a compact digest of it
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+        lot_col = _pick(df.columns, LOT_COLUMNS)
+        qty_col = _pick(df.columns, QUANTITY_COLUMNS)
+        time_col = _pick(df.columns, TIME_COLUMNS)
+
+        digest = {"rows": len(df)}
+        self.rows += len(df)
+
+        if qty_col is not None:
+            quantity = pd.to_numeric(df[qty_col], errors="coerce")
+            units = int(quantity[quantity > 0].sum())
+            negative = int((quantity < 0).sum())
+            self.units += units
+            self.negative_quantity += negative
+            digest.update(units=units, negativeQuantity=negative)
+
+        if lot_col is None:
+            return digest
+
+        missing = int(df[lot_col].isna().sum())
+        self.missing_lot += missing
+        digest["missingLot"] = missing
+
+        frame = pd.DataFrame({"lot": df[lot_col].astype("string")}).dropna()
+        if time_col is not None:
+            frame["ts"] = pd.to_datetime(df[time_col], errors="coerce")
+            unparseable = int(frame["ts"].isna().sum())
+            self.unparseable_dates += unparseable
+            digest["unparseableDates"] = unparseable
+            frame = frame.dropna()
+            # Backwards steps are found in file order, before sorting hides them
+            frame["back"] = frame["ts"] < frame.groupby("lot")["ts"].shift()
+            in_file_order = frame.groupby("lot").agg(
+                head=("ts", "first"), tail=("ts", "last"), backwards=("back", "any")
+            )
+            frame = frame.sort_values(["lot", "ts"], kind="stable")
+            frame["gap"] = frame.groupby("lot")["ts"].diff()
+            per_lot = frame.groupby("lot").agg(
+                count=("ts", "size"), first=("ts", "min"), last=("ts", "max"), gap=("gap", "max")
+            ).join(in_file_order)
+        else:
+            per_lot = frame.groupby("lot").size().to_frame("count")
+            no_time = pd.Series(pd.NaT, index=per_lot.index, dtype="datetime64[ns]")
+            per_lot["first"] = per_lot["last"] = per_lot["head"] = per_lot["tail"] = no_time
+            per_lot["gap"] = pd.Series(pd.NaT, index=per_lot.index, dtype="timedelta64[ns]")
+            per_lot["backwards"] = False
+
+        # Bridge from each lot's previous chunk: the gap to its latest
+        # timestamp, and the order against its last row in the file
+        known = self.lots.reindex(per_lot.index)
+        bridge = per_lot["first"] - known["last"]
+        gap = pd.concat([per_lot["gap"], bridge.mask(bridge < pd.Timedelta(0))], axis=1).max(axis=1)
+        backwards = per_lot["backwards"] | (per_lot["head"] < known["tail"])
+
+        merged = pd.DataFrame({
+            "count": known["count"].fillna(0).astype("int64") + per_lot["count"],
+            "last": pd.concat([known["last"], per_lot["last"]], axis=1).max(axis=1),
+            "gap": pd.concat([known["gap"], gap], axis=1).max(axis=1),
+            "tail": per_lot["tail"].fillna(known["tail"]),
+            "backwards": known["backwards"].fillna(False).astype(bool) | backwards
+        })
+        self.lots = pd.concat([self.lots[~self.lots.index.isin(merged.index)], merged])
+
+        large_gaps = gap[gap > self.gap].nlargest(10)
+        digest["distinctLots"] = len(per_lot)
+        digest["busiestLots"] = per_lot["count"].nlargest(5).astype(int).to_dict()
+        digest["largeGaps"] = [
+            {"lotNumber": lot, "gapDays": round(value.total_seconds() / 86400, 1)}
+            for lot, value in large_gaps.items()
+        ]
+        return digest
+
+    def summary(self, top=20):
+        """
+        Ledger-wide statistics accumulated so far
+        """
+        gaps = self.lots[self.lots["gap"] > self.gap].sort_values("gap", ascending=False, kind="stable")
+        return {
+            "columns": self.columns,
+            "transferCount": self.rows,
+            "totalUnits": self.units,
+            "distinctLots": len(self.lots),
+            "lotsWithSingleTransfer": int((self.lots["count"] == 1).sum()),
+            "rowsMissingLot": self.missing_lot,
+            "rowsWithNegativeQuantity": self.negative_quantity,
+            "rowsWithUnparseableDates": self.unparseable_dates,
+            "outOfOrderLots": int(self.lots["backwards"].sum()),
+            "lotsWithLargeGaps": len(gaps),
+            "largestGaps": [
+                {"lotNumber": lot, "transfers": int(count), "gapDays": round(gap.total_seconds() / 86400, 1)}
+                for lot, count, gap in zip(gaps.index[:top], gaps["count"][:top], gaps["gap"][:top])
+            ]
+        }
@@ -0,0 +1,190 @@
+# llm_cache.py
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+def _canonical(value):
+    # Bytes are represented by their digest so images hash cheaply and stably
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes_sha256__": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+def make_key(model_name, helper, template_version, inputs):
+    """
+    Content address for a model call
+
+    Args:
+        model_name: Name of the model the prompt is sent to
+        helper: Name of the helper building the prompt
+        template_version: Version of that helper's prompt template
+        inputs: Inputs the prompt is built from; bytes are hashed
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        [model_name, helper, template_version, _canonical(inputs)],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Disk eviction frees space down to this fraction of the budget, so the
+# writes that follow do not each trigger another eviction
+DISK_LOW_WATER = 0.9
+
+class ResponseCache:
+    """
+    Two-tier cache of model response text keyed by `make_key`
+
+    The memory tier is an LRU bounded by total text size. The disk tier
+    stores one JSON file per key and evicts the least recently written files
+    once the directory exceeds its size budget, down to `DISK_LOW_WATER` of
+    it. Files are tracked in an in-memory index in write order, so eviction
+    never rescans the directory, and all disk I/O runs on one worker thread
+    off the event loop. Every entry carries its own expiry so helpers can use
+    different TTLs.
+
+    Args:
+        directory: Directory for the disk tier, or None to disable it
+        memory_bytes: Size budget for the memory tier
+        disk_bytes: Size budget for the disk tier
+    """
+
+    def __init__(self, directory, memory_bytes=32 * 1024 * 1024, disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        # key -> file size, least recently written first; only touched on the disk thread
+        self._files = OrderedDict()
+        self._disk_size = 0
+        self._disk = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            entries = sorted(
+                (entry for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in entries:
+                self._files[entry.name[:-len(".json")]] = entry.stat().st_size
+            self._disk_size = sum(self._files.values())
+            self._disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def _on_disk(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._disk, fn, *args)
+
+    async def get(self, key):
+        """
+        Return cached text for a key, or None if absent or expired
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            text, expires_at = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return text
+            self._drop_memory(key)
+
+        if self.directory:
+            stored = await self._on_disk(self._read, key, now)
+            if stored is not None:
+                self._put_memory(key, stored["text"], stored["expiresAt"])
+                self.disk_hits += 1
+                return stored["text"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key, text, ttl):
+        """
+        Store response text in both tiers for `ttl` seconds
+        """
+        expires_at = time.time() + ttl
+        self._put_memory(key, text, expires_at)
+
+        if self.directory:
+            await self._on_disk(self._write, key, text, expires_at)
+
+    def _put_memory(self, key, text, expires_at):
+        self._drop_memory(key)
+        self._memory[key] = (text, expires_at)
+        self._memory_size += len(text)
+        while self._memory_size > self.memory_bytes and self._memory:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _drop_memory(self, key):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_size -= len(entry[0])
+
+    def _read(self, key, now):
+        if key not in self._files:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = None
+        if stored is None or stored["expiresAt"] <= now:
+            self._remove_file(key)
+            return None
+        return stored
+
+    def _write(self, key, text, expires_at):
+        path = self._path(key)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"expiresAt": expires_at, "text": text}, f)
+        self._disk_size -= self._files.pop(key, 0)
+        self._files[key] = os.path.getsize(path)
+        self._disk_size += self._files[key]
+        if self._disk_size > self.disk_bytes:
+            self._evict_disk()
+
+    def _remove_file(self, key):
+        self._disk_size -= self._files.pop(key, 0)
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        # Oldest files go first until the directory is under the low-water mark
+        while self._files and self._disk_size > self.disk_bytes * DISK_LOW_WATER:
+            self._remove_file(next(iter(self._files)))
+            self.disk_evictions += 1
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memoryEntries": len(self._memory),
+            "memoryBytes": self._memory_size,
+            "diskEntries": len(self._files),
+            "diskBytes": self._disk_size,
+            "diskEvictions": self.disk_evictions,
+            "memoryHits": self.memory_hits,
+            "diskHits": self.disk_hits,
+            "misses": self.misses,
+            "hitRate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,118 @@
+# log_fetcher.py
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Substrings nodes and hosted providers use when a log query covers too much
+RANGE_ERRORS = (
+    "more than",
+    "too many",
+    "limit exceeded",
+    "response size",
+    "block range",
+    "range is too",
+    "query timeout",
+)
+
+def _is_range_error(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in RANGE_ERRORS)
+
+class LogFetcher:
+    """
+    Fetch logs over a large block span in adaptive windows
+
+    The span is cut into windows that are fetched by several concurrent
+    workers. A window the node rejects as too large is split in half and
+    retried, and the window size shrinks; windows that come back sparse make
+    it grow again. The current window size carries over between calls.
+
+    Args:
+        fetch_range: async callable (from_block, to_block, **filters) -> list of logs
+        initial_window: Starting window size in blocks
+        min_window: Smallest window the fetcher will shrink to
+        max_window: Largest window the fetcher will grow to
+        concurrency: Number of windows fetched at once
+        target_results: Logs per window considered dense; windows returning
+            under a quarter of this grow the window size
+    """
+
+    def __init__(self, fetch_range, initial_window=2000, min_window=1, max_window=100000,
+                 concurrency=4, target_results=2000):
+        self.fetch_range = fetch_range
+        self.window = initial_window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.concurrency = concurrency
+        self.target_results = target_results
+
+    def _shrink(self, failed_size):
+        self.window = max(self.min_window, min(self.window, failed_size // 2))
+
+    def _grow(self):
+        self.window = min(self.max_window, self.window * 2)
+
+    async def fetch(self, from_block, to_block, **filters):
+        """
+        Fetch every log between two blocks (inclusive), in block order
+
+        Args:
+            from_block: First block of the span
+            to_block: Last block of the span
+            **filters: Passed through to `fetch_range`, e.g. argument_filters
+
+        Returns:
+            list: Logs ordered by block number and log index
+        """
+        results = []
+        split_ranges = []
+        next_block = from_block
+
+        def next_range():
+            nonlocal next_block
+            # Finish ranges that were split before cutting new ones
+            if split_ranges:
+                return split_ranges.pop()
+            if next_block > to_block:
+                return None
+            start = next_block
+            end = min(start + self.window - 1, to_block)
+            next_block = end + 1
+            return start, end
+
+        async def worker():
+            while True:
+                block_range = next_range()
+                if block_range is None:
+                    return
+                start, end = block_range
+                try:
+                    logs = await self.fetch_range(start, end, **filters)
+                except Exception as e:
+                    size = end - start + 1
+                    if size <= 1 or not _is_range_error(e):
+                        raise
+                    self._shrink(size)
+                    middle = start + size // 2
+                    split_ranges.extend([(middle, end), (start, middle - 1)])
+                    logger.debug("Log range %s-%s too large, splitting: %s", start, end, e)
+                    continue
+
+                results.extend(logs)
+                if len(logs) < self.target_results // 4:
+                    self._grow()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # On failure or cancellation, stop the other workers issuing requests
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        results.sort(key=lambda log: (log['blockNumber'], log['logIndex']))
+        return results
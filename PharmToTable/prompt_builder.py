@@ -0,0 +1,142 @@
+# prompt_builder.py
+import json
+from datetime import datetime
+
+# Gemini bills an inline image as a fixed number of tokens
+IMAGE_TOKENS = 258
+
+HISTORY_COLUMNS = ("#", "timestamp", "from", "to", "location", "verified")
+
+def estimate_tokens(contents):
+    """
+    Rough prompt size in tokens (about four characters per token)
+    """
+    parts = contents if isinstance(contents, list) else [contents]
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // 4 + 1
+        else:
+            tokens += IMAGE_TOKENS
+    return tokens
+
+def compact_json(value):
+    """
+    Serialize a value for a prompt without indentation or padding
+    """
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+def anomalous_transfers(history, max_gap_days=30):
+    """
+    Indexes of transfers that break the chain, go back in time, follow a
+    long gap or are unverified
+    """
+    flagged = set()
+    previous = None
+    for i, transfer in enumerate(history):
+        if not transfer.get("verified", False):
+            flagged.add(i)
+        if previous is not None:
+            if transfer.get("from") != previous.get("to"):
+                flagged.add(i)
+            try:
+                gap = datetime.fromisoformat(transfer["timestamp"]) - datetime.fromisoformat(previous["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                flagged.add(i)
+            else:
+                if gap.total_seconds() < 0 or gap.days > max_gap_days:
+                    flagged.add(i)
+        previous = transfer
+    return flagged
+
+def _render(history, rows, parties):
+    # The legend lists only the parties that appear in the rows shown
+    shown = {}
+    for i in rows:
+        for address in (history[i].get("from"), history[i].get("to")):
+            shown[address] = parties[address]
+    legend = "parties: " + ", ".join(f"{alias}={address}" for address, alias in shown.items())
+    return f"{legend}\n{_table(history, rows, parties)}"
+
+def _table(history, rows, parties):
+    lines = ["|".join(HISTORY_COLUMNS)]
+    for i in rows:
+        transfer = history[i]
+        lines.append("|".join((
+            str(i + 1),
+            str(transfer.get("timestamp", "")),
+            parties[transfer.get("from")],
+            parties[transfer.get("to")],
+            str(transfer.get("location", "")).replace("|", "/"),
+            "y" if transfer.get("verified", False) else "n"
+        )))
+    return "\n".join(lines)
+
+def _sample(candidates, count):
+    # Evenly spaced picks so the kept rows cover the whole journey
+    if count <= 0 or not candidates:
+        return []
+    if count >= len(candidates):
+        return list(candidates)
+    step = len(candidates) / count
+    return [candidates[int(k * step)] for k in range(count)]
+
+def serialize_history(history, budget_tokens, max_gap_days=30):
+    """
+    Render a transfer history as a compact table that fits a token budget
+
+    Addresses are replaced by short aliases, listed once in a legend of the
+    parties in the rows shown. If the full table is over budget, the first
+    and last hops and every anomalous transfer are kept, the remaining
+    budget is filled with evenly sampled transfers, and a line states how
+    many transfers were left out. The legend counts against the budget.
+    Required rows are kept even if they alone exceed the budget.
+
+    Args:
+        history: Transfers as returned by get_medication_history, oldest first
+        budget_tokens: Token budget for the serialized history
+        max_gap_days: Gap after which a transfer counts as anomalous
+
+    Returns:
+        tuple: (text, info) where info reports `transfers`, `shown`,
+               `sampled` and the estimated `tokens`
+    """
+    parties = {}
+    for transfer in history:
+        for address in (transfer.get("from"), transfer.get("to")):
+            if address not in parties:
+                parties[address] = f"P{len(parties) + 1}"
+
+    rows = list(range(len(history)))
+    text = _render(history, rows, parties)
+    tokens = estimate_tokens(text)
+
+    if tokens > budget_tokens and len(history) > 2:
+        keep = {0, len(history) - 1} | anomalous_transfers(history, max_gap_days)
+        required = sorted(keep)
+        optional = [i for i in rows if i not in keep]
+        # Legend entries are spread over the rows; header and footer lines
+        # are budgeted as four more rows
+        per_row = max(1, -(-tokens // (len(history) + 1)))
+        room = budget_tokens // per_row - 4 - len(required)
+        while True:
+            rows = sorted(required + _sample(optional, room))
+            omitted = len(history) - len(rows)
+            text = (
+                f"{_render(history, rows, parties)}\n"
+                f"({omitted} of {len(history)} transfers omitted; all omitted transfers are verified, "
+                f"continuous and within {max_gap_days} days of the previous one)"
+            )
+            tokens = estimate_tokens(text)
+            if tokens <= budget_tokens or room <= 0:
+                break
+            # Sampled rows can bring more new parties than average; shrink
+            # the sample in proportion to the overshoot
+            room = min(room - 1, room * budget_tokens // tokens)
+
+    return text, {
+        "transfers": len(history),
+        "shown": len(rows),
+        "sampled": len(rows) < len(history),
+        "tokens": tokens
+    }
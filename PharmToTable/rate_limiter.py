@@ -0,0 +1,110 @@
+# rate_limiter.py
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+# Set while a background job (e.g. batch processing) is issuing model calls
+_background = ContextVar("background_work", default=False)
+
+@contextmanager
+def background_work():
+    """
+    Mark model calls made inside this block (and tasks it spawns) as background
+
+    Background calls never use the in-flight slots reserved for interactive
+    requests, so a saturating batch job cannot starve the API.
+    """
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket that makes callers wait instead of failing
+
+    Args:
+        per_minute: Tokens added per minute (also the bucket capacity)
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+        # Waiters are served in arrival order
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+class ModelLimiter:
+    """
+    Shared gate in front of every model call
+
+    Enforces a maximum number of in-flight calls plus requests-per-minute and
+    tokens-per-minute budgets. Callers over budget queue until capacity frees
+    up. `reserved_interactive` slots are kept for calls made outside
+    `background_work()`.
+
+    Args:
+        max_in_flight: Maximum concurrent model calls
+        requests_per_minute: Request budget
+        tokens_per_minute: Prompt token budget
+        reserved_interactive: In-flight slots background calls may not use
+    """
+
+    def __init__(self, max_in_flight=8, requests_per_minute=60, tokens_per_minute=1000000,
+                 reserved_interactive=2):
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._background_slots = asyncio.Semaphore(max(1, max_in_flight - reserved_interactive))
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self.waiting = 0
+        self.active = 0
+
+    @asynccontextmanager
+    async def slot(self, tokens):
+        """
+        Wait for budget and an in-flight slot for a call of about `tokens` tokens
+        """
+        background = _background.get()
+        self.waiting += 1
+        try:
+            if background:
+                await self._background_slots.acquire()
+            try:
+                await self._requests.acquire(1)
+                await self._tokens.acquire(tokens)
+                await self._in_flight.acquire()
+            except BaseException:
+                if background:
+                    self._background_slots.release()
+                raise
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._in_flight.release()
+            if background:
+                self._background_slots.release()
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting}
@@ -0,0 +1,124 @@
+# response_encoding.py
+import asyncio
+import gzip
+import json
+from fastapi.responses import Response
+
+# Optional accelerators; without them the stdlib encoder and gzip are used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies larger than this are compressed on a worker thread
+OFFLOAD_BYTES = 256 * 1024
+
+def dumps(content, fast=False):
+    """
+    Serialize a response body to UTF-8 JSON bytes
+
+    Args:
+        content: JSON-compatible value
+        fast: Use orjson when it is installed
+
+    Returns:
+        bytes: Compact JSON, as `JSONResponse` would render it
+    """
+    if fast and orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=str
+    ).encode("utf-8")
+
+def _qualities(accept_encoding):
+    qualities = {}
+    for part in (accept_encoding or "").split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+def choose_encoding(accept_encoding):
+    """
+    Pick the content coding for a response from the request's Accept-Encoding
+
+    Brotli is preferred when the `brotli` package is installed, then gzip.
+
+    Returns:
+        str: "br", "gzip" or None for an uncompressed body
+    """
+    qualities = _qualities(accept_encoding)
+    default = qualities.get("*", 0.0)
+    if brotli is not None and qualities.get("br", default) > 0:
+        return "br"
+    if qualities.get("gzip", default) > 0:
+        return "gzip"
+    return None
+
+def compress(body, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    return body
+
+class ResponseEncoder:
+    """
+    Builds JSON responses directly, skipping FastAPI's `jsonable_encoder`
+
+    Endpoints that return large transfer histories hand their result to
+    `response()`, which serializes it once (with orjson when `fast_json` is
+    set) and compresses it with brotli or gzip when the client accepts it
+    and the body is at least `min_bytes` long.
+
+    Args:
+        fast_json: Serialize with orjson when it is installed
+        min_bytes: Smallest body that is compressed; negative disables compression
+        gzip_level: gzip compression level
+        brotli_quality: Brotli quality
+    """
+
+    def __init__(self, fast_json=False, min_bytes=1024, gzip_level=6, brotli_quality=4):
+        self.fast_json = fast_json
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def response(self, content, accept_encoding=None, status_code=200):
+        """
+        Encode `content` as a JSON response for a client sending `accept_encoding`
+        """
+        body = dumps(content, self.fast_json)
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = None
+        if 0 <= self.min_bytes <= len(body):
+            encoding = choose_encoding(accept_encoding)
+        if encoding is not None:
+            if len(body) > OFFLOAD_BYTES:
+                loop = asyncio.get_running_loop()
+                body = await loop.run_in_executor(
+                    None, compress, body, encoding, self.gzip_level, self.brotli_quality
+                )
+            else:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Encoding"] = encoding
+        return Response(body, status_code=status_code, media_type="application/json", headers=headers)
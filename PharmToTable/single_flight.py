@@ -0,0 +1,61 @@
+# single_flight.py
+import asyncio
+
+class SingleFlight:
+    """
+    Share one in-flight computation among concurrent callers with the same key
+
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs await the same task instead of starting another.
+    The task is shielded, so one caller going away (e.g. a client
+    disconnecting) does not cancel it for the others. Once it finishes, the
+    next caller starts afresh.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key, fn, *args):
+        """
+        Return the result of `fn(*args)`, sharing it with concurrent calls for `key`
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the outcome as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def is_current(self, key, task):
+        """
+        Whether `task` is still the computation new callers for `key` would join
+        """
+        return self._calls.get(key) is task
+
+    def forget(self, keys=None):
+        """
+        Stop sharing in-flight computations for the given keys (all when None)
+
+        Callers arriving afterwards start a new computation; callers already
+        waiting still get the old result.
+        """
+        if keys is None:
+            self._calls.clear()
+            return
+        for key in keys:
+            self._calls.pop(key, None)
+
+    def stats(self):
+        return {"inFlight": len(self._calls), "started": self.started, "shared": self.shared}
@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# The service modules are imported by their top-level names, as app.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,123 @@
+# test_batch_jobs.py
+import asyncio
+
+from batch_jobs import COMPLETED, PAUSED, BatchJobEngine, JobStore
+
+async def wait_for_status(store, job_id, status, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while store.get_job(job_id)["status"] != status:
+        assert asyncio.get_running_loop().time() < deadline, store.get_job(job_id)
+        await asyncio.sleep(0.01)
+    return store.get_job(job_id)
+
+def test_failing_window_pauses_job_until_resumed(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    healthy = False
+    calls = []
+
+    async def process_rows(items):
+        calls.append(list(items))
+        if not healthy:
+            raise RuntimeError("rpc unavailable")
+        return [{"lotNumber": lot, "ndc": ndc} for lot, ndc in items]
+
+    async def scenario():
+        nonlocal healthy
+        engine = BatchJobEngine(store, process_rows, concurrency=1, chunk_rows=2, retries=2, retry_delay=0)
+        engine.start()
+        try:
+            job = await engine.submit("lots.csv", [("A", "1"), ("B", "2"), ("C", "3")])
+            paused = await wait_for_status(store, job["jobId"], PAUSED)
+            assert len(calls) == 3
+            assert "rpc unavailable" in paused["error"]
+            assert paused["processedRows"] == 0
+
+            healthy = True
+            engine.resume(job["jobId"])
+            return await wait_for_status(store, job["jobId"], COMPLETED)
+        finally:
+            await engine.stop()
+
+    done = asyncio.run(scenario())
+
+    assert done["processedRows"] == 3
+    assert done["error"] is None
+    assert [row["lotNumber"] for row in store.get_results(done["jobId"])] == ["A", "B", "C"]
+    store.close()
+
+def test_resume_rejects_jobs_that_are_not_paused(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+
+    async def process_rows(items):
+        return [{} for _ in items]
+
+    async def scenario():
+        engine = BatchJobEngine(store, process_rows)
+        engine.start()
+        try:
+            job = await engine.submit("lots.csv", [("A", "1")])
+            await wait_for_status(store, job["jobId"], COMPLETED)
+            assert engine.resume("unknown") is None
+            try:
+                engine.resume(job["jobId"])
+            except ValueError:
+                return
+            raise AssertionError("resumed a completed job")
+        finally:
+            await engine.stop()
+
+    asyncio.run(scenario())
+    store.close()
+
+def test_paused_jobs_resume_on_start(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create_job("job", "lots.csv")
+    store.add_rows("job", [("A", "1")])
+    store.set_status("job", PAUSED, "Paused after repeated failures: boom")
+
+    assert store.unfinished_jobs() == ["job"]
+    store.close()
+
+def test_save_results_fans_out_to_duplicate_rows(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.create_job("job", "lots.csv")
+    store.add_rows("job", [("A", "1"), ("B", "2"), ("A", "1"), ("A", "9"), ("B", "2")])
+
+    store.save_results("job", [(("A", "1"), {"isAuthentic": True}), (("B", "2"), {"error": "not found"})])
+
+    job = store.get_job("job")
+    assert job["processedRows"] == 4
+    assert job["errorRows"] == 2
+    assert store.pending_rows("job", 10) == [(3, "A", "9")]
+    assert store.get_results("job") == [
+        {"row": 0, "isAuthentic": True},
+        {"row": 1, "error": "not found"},
+        {"row": 2, "isAuthentic": True},
+        {"row": 4, "error": "not found"}
+    ]
+    store.close()
+
+def test_duplicates_are_processed_once_per_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    calls = []
+
+    async def process_rows(items):
+        calls.append(list(items))
+        return [{"lotNumber": lot} for lot, _ in items]
+
+    async def scenario():
+        engine = BatchJobEngine(store, process_rows, chunk_rows=2)
+        engine.start()
+        try:
+            # The later duplicates of A fall in windows after A was verified
+            job = await engine.submit("lots.csv", [("A", "1"), ("A", "1"), ("B", "2"), ("A", "1"), ("C", "3")])
+            return await wait_for_status(store, job["jobId"], COMPLETED)
+        finally:
+            await engine.stop()
+
+    done = asyncio.run(scenario())
+
+    assert calls == [[("A", "1")], [("B", "2"), ("C", "3")]]
+    assert done["processedRows"] == 5
+    assert [row["lotNumber"] for row in store.get_results(done["jobId"])] == ["A", "A", "B", "A", "C"]
+    store.close()
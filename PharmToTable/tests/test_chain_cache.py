@@ -0,0 +1,33 @@
+# test_chain_cache.py
+import asyncio
+
+from chain_cache import LotCache
+
+def test_rejected_values_are_not_cached():
+    cache = LotCache(cache_if=lambda result: result["registered"])
+    loads = []
+
+    async def load(lot_number):
+        loads.append(lot_number)
+        # The lot is registered by another writer after the first lookup
+        return {"registered": len(loads) > 1}
+
+    async def scenario():
+        first = await cache.get_or_load("LOT-A", 100, load)
+        second = await cache.get_or_load("LOT-A", 100, load)
+        third = await cache.get_or_load("LOT-A", 100, load)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert not first["registered"]
+    assert second["registered"] and third["registered"]
+    assert loads == ["LOT-A", "LOT-A"]
+    assert cache.stats()["hits"] == 1
+
+def test_entries_expire_after_max_age_blocks():
+    cache = LotCache(max_age_blocks=10)
+    cache.put("LOT-A", "value", 100)
+
+    assert cache.get("LOT-A", 110) == (True, "value")
+    assert cache.get("LOT-A", 111) == (False, None)
@@ -0,0 +1,65 @@
+# test_custody_rules.py
+from custody_rules import MANUFACTURER, PHARMACY, WHOLESALER, check_custody
+
+MAKER = "0x1000000000000000000000000000000000000001"
+DISTRIBUTOR = "0x2000000000000000000000000000000000000002"
+STORE = "0x3000000000000000000000000000000000000003"
+
+def make_history(*hops):
+    return [
+        {"from": sender, "to": recipient, "timestamp": f"2024-01-{day:02d}T00:00:00", "verified": True}
+        for day, (sender, recipient) in enumerate(hops, start=1)
+    ]
+
+def test_valid_chain_is_authentic():
+    history = make_history((MAKER, DISTRIBUTOR), (DISTRIBUTOR, STORE))
+    roles = {MAKER: {MANUFACTURER}, DISTRIBUTOR: {WHOLESALER}, STORE: {PHARMACY}}
+
+    result = check_custody(history, roles)
+
+    assert result["issues"] == []
+    assert result["isAuthentic"] and result["conclusive"]
+    assert result["checks"]["chainStartsAtManufacturer"]
+
+def test_dual_role_address_passes_any_valid_pair():
+    # The wholesaler also holds the manufacturer role; both hops are still
+    # allowed by onlyValidTransfer
+    history = make_history((MAKER, DISTRIBUTOR), (DISTRIBUTOR, STORE))
+    roles = {
+        MAKER: frozenset({MANUFACTURER}),
+        DISTRIBUTOR: frozenset({MANUFACTURER, WHOLESALER}),
+        STORE: frozenset({PHARMACY})
+    }
+
+    result = check_custody(history, roles)
+
+    assert result["issues"] == []
+    assert result["authenticityScore"] == 1.0
+    assert result["isAuthentic"] and result["conclusive"]
+
+def test_hop_without_a_valid_role_pair_is_flagged():
+    history = make_history((MAKER, STORE))
+    roles = {MAKER: {MANUFACTURER, PHARMACY}, STORE: {PHARMACY}}
+
+    result = check_custody(history, roles)
+
+    assert len(result["issues"]) == 1
+    assert "manufacturer/pharmacy to pharmacy" in result["issues"][0]
+
+def test_address_with_no_role_is_flagged():
+    history = make_history((MAKER, DISTRIBUTOR))
+    roles = {MAKER: frozenset(), DISTRIBUTOR: {WHOLESALER}}
+
+    result = check_custody(history, roles)
+
+    assert not result["checks"]["chainStartsAtManufacturer"]
+    assert any("not a manufacturer" in issue for issue in result["issues"])
+    assert any("does not allow" in issue for issue in result["issues"])
+
+def test_unknown_roles_are_inconclusive():
+    history = make_history((MAKER, DISTRIBUTOR), (DISTRIBUTOR, STORE))
+
+    result = check_custody(history, {MAKER: {MANUFACTURER}})
+
+    assert not result["checks"]["rolesKnown"]
+    assert not result["conclusive"]
@@ -0,0 +1,160 @@
+# test_event_index.py
+import asyncio
+
+from hexbytes import HexBytes
+
+from event_index import TransferIndex, TransferIndexer, decode_transfer
+
+def block_hash(number, fork=0):
+    return f"0x{fork:02x}{number:062x}"
+
+class FakeChain:
+    """
+    Blocks 0..head, each holding the Transfer logs put into it
+
+    `fork(from_block)` replaces every block from `from_block` on with new
+    hashes and no logs, as a reorg would.
+    """
+
+    def __init__(self, head):
+        self.blocks = {number: {"hash": block_hash(number), "logs": []} for number in range(head + 1)}
+        self.fetched = []
+
+    @property
+    def head(self):
+        return max(self.blocks)
+
+    def mine(self, *lots):
+        number = self.head + 1
+        self.blocks[number] = {"hash": block_hash(number), "logs": []}
+        for lot in lots:
+            self.add_log(number, lot)
+        return number
+
+    def add_log(self, number, lot):
+        block = self.blocks[number]
+        log_index = len(block["logs"])
+        block["logs"].append({
+            "blockNumber": number,
+            "logIndex": log_index,
+            "transactionHash": HexBytes(f"0x{number:032x}{log_index:032x}"),
+            "blockHash": HexBytes(block["hash"]),
+            "args": {
+                "lotNumber": lot,
+                "from": "0xfrom",
+                "to": "0xto",
+                "location": "Springfield",
+                "timestamp": 1700000000 + number,
+                "verified": True
+            }
+        })
+
+    def fork(self, from_block, fork=1):
+        for number in range(from_block, self.head + 1):
+            self.blocks[number] = {"hash": block_hash(number, fork), "logs": []}
+
+    async def fetch_logs(self, from_block, to_block):
+        self.fetched.append((from_block, to_block))
+        return [
+            log for number in range(from_block, to_block + 1) for log in self.blocks[number]["logs"]
+        ]
+
+    async def get_block_number(self):
+        return self.head
+
+    async def get_block(self, number):
+        block = self.blocks.get(number)
+        if block is None:
+            return None
+        parent = self.blocks.get(number - 1)
+        return {
+            "number": number,
+            "hash": block["hash"],
+            "parentHash": parent["hash"] if parent else "0x0"
+        }
+
+    def indexer(self, index, **kwargs):
+        return TransferIndexer(
+            index, self.fetch_logs, self.get_block_number, self.get_block,
+            batch_blocks=4, confirmations=3, **kwargs
+        )
+
+def blocks_of(history):
+    return [transfer["blockNumber"] for transfer in history]
+
+def test_rollback_to_common_ancestor(tmp_path):
+    chain = FakeChain(head=0)
+    for _ in range(10):
+        chain.mine("LOT-A")
+    index = TransferIndex(str(tmp_path / "index.db"))
+    changes = []
+    indexer = chain.indexer(index, on_change=changes.append)
+    asyncio.run(indexer.sync_once())
+    assert blocks_of(index.get_history("LOT-A")) == list(range(1, 11))
+
+    # Blocks 9 and 10 are replaced; the new branch moves LOT-A's last
+    # transfer to block 11
+    chain.fork(9)
+    chain.mine("LOT-A")
+    asyncio.run(indexer.sync_once())
+
+    assert blocks_of(index.get_history("LOT-A")) == [1, 2, 3, 4, 5, 6, 7, 8, 11]
+    assert index.get_checkpoint() == 11
+    assert index.get_block_hash(8) == block_hash(8)
+    assert index.get_block_hash(9) == block_hash(9, fork=1)
+    # A rollback invalidates every lot
+    assert None in changes
+
+def test_fork_deeper_than_tracked_headers_drops_unconfirmed_window(tmp_path):
+    chain = FakeChain(head=0)
+    for _ in range(10):
+        chain.mine("LOT-A")
+    index = TransferIndex(str(tmp_path / "index.db"))
+    indexer = chain.indexer(index)
+    asyncio.run(indexer.sync_once())
+    oldest_tracked = index.get_tracked_blocks()[-1][0]
+
+    chain.fork(oldest_tracked)
+    asyncio.run(indexer.sync_once())
+
+    assert blocks_of(index.get_history("LOT-A")) == list(range(1, oldest_tracked))
+    assert index.get_checkpoint() == 10
+
+def test_resume_from_checkpoint(tmp_path):
+    path = str(tmp_path / "index.db")
+    chain = FakeChain(head=0)
+    for _ in range(6):
+        chain.mine("LOT-A")
+    index = TransferIndex(path)
+    asyncio.run(chain.indexer(index).sync_once())
+    assert index.get_checkpoint() == 6
+    index.close()
+
+    # A restarted indexer only fetches blocks after the checkpoint
+    chain.mine("LOT-A", "LOT-B")
+    chain.fetched.clear()
+    index = TransferIndex(path)
+    asyncio.run(chain.indexer(index).sync_once())
+
+    assert chain.fetched == [(7, 7)]
+    assert blocks_of(index.get_history("LOT-A")) == list(range(1, 8))
+    assert blocks_of(index.get_history("LOT-B")) == [7]
+
+def test_reingest_is_idempotent(tmp_path):
+    chain = FakeChain(head=0)
+    for _ in range(5):
+        chain.mine("LOT-A", "LOT-A")
+    index = TransferIndex(str(tmp_path / "index.db"))
+    indexer = chain.indexer(index)
+    asyncio.run(indexer.sync_once())
+    history = index.get_history("LOT-A", finalized_block=5)
+
+    # Re-indexing the same blocks, e.g. after a crash before the checkpoint
+    # commit, leaves one row per (blockNumber, logIndex)
+    index.rollback(2)
+    asyncio.run(indexer.sync_once())
+    logs = asyncio.run(chain.fetch_logs(1, 5))
+    index.add_transfers([decode_transfer(log) for log in logs], 5)
+
+    assert index.get_history("LOT-A", finalized_block=5) == history
+    assert len(history) == 10
@@ -0,0 +1,132 @@
+# test_history_pages.py
+import base64
+
+import pytest
+
+from event_index import (
+    HISTORY_FIELDS,
+    TransferIndex,
+    decode_cursor,
+    encode_cursor,
+    format_page,
+    paginate_transfers
+)
+
+LOT = "LOT-A"
+
+def make_transfer(block_number, log_index, lot=LOT):
+    return {
+        "blockNumber": block_number,
+        "logIndex": log_index,
+        "lotNumber": lot,
+        "from": f"0xfrom{block_number}{log_index}",
+        "to": f"0xto{block_number}{log_index}",
+        "location": "Springfield",
+        "timestamp": 1700000000 + block_number,
+        "verified": True,
+        "transactionHash": f"0x{block_number:x}{log_index:x}",
+        "blockHash": f"0xb{block_number:x}"
+    }
+
+@pytest.fixture
+def transfers():
+    # Block 2 holds three logs for the lot, and another lot's log sits between them
+    return [
+        make_transfer(1, 0),
+        make_transfer(2, 0),
+        make_transfer(2, 1),
+        make_transfer(2, 2, lot="LOT-B"),
+        make_transfer(2, 3),
+        make_transfer(3, 0)
+    ]
+
+@pytest.fixture
+def index(tmp_path, transfers):
+    index = TransferIndex(str(tmp_path / "index.db"))
+    index.add_transfers(transfers, 3)
+    yield index
+    index.close()
+
+def walk(get_page, limit):
+    """
+    Follow next cursors from the first page, as a client would
+    """
+    pages, after = [], None
+    while True:
+        page, next_position = get_page(after, limit)
+        pages.append(page)
+        if next_position is None:
+            return pages
+        after = decode_cursor(encode_cursor(next_position))
+
+@pytest.mark.parametrize("position", [(0, 0), (2, 1), (18446744073709551615, 4294967295)])
+def test_cursor_round_trip(position):
+    cursor = encode_cursor(position)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == position
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!!",
+    base64.urlsafe_b64encode(b"12").decode(),
+    base64.urlsafe_b64encode(b"1:2:3").decode(),
+    base64.urlsafe_b64encode(b"one:2").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe:1").decode(),
+    encode_cursor((2, 1))[:-1] + "*"
+])
+def test_bad_or_tampered_cursor_is_rejected(cursor):
+    # The endpoint turns this ValueError into a 400
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_page_boundary_inside_a_block(index, order):
+    full = index.get_history(LOT, finalized_block=3)
+    expected = full if order == "asc" else full[::-1]
+
+    pages = walk(lambda after, limit: index.get_history_page(LOT, after, order, limit, finalized_block=3), 2)
+
+    # The first page ends at log 0 of block 2, and the next resumes at log 1
+    # of the same block
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [transfer for page in pages for transfer in page] == expected
+
+@pytest.mark.parametrize("limit", [1, 2, 5, 6, 100])
+def test_limit_bounds(index, limit):
+    full = index.get_history(LOT)
+
+    pages = walk(lambda after, limit: index.get_history_page(LOT, after, "asc", limit), limit)
+
+    assert [transfer for page in pages for transfer in page] == full
+    assert all(len(page) <= limit for page in pages)
+    # A page that exactly reaches the end has no next cursor
+    assert len(pages) == max(1, -(-len(full) // limit))
+
+def test_fields_projection(index):
+    page, next_position = index.get_history_page(LOT, None, "desc", 2, ["blockNumber", "confirmed"], finalized_block=2)
+
+    assert page == [
+        {"blockNumber": 3, "confirmed": False},
+        {"blockNumber": 2, "confirmed": True}
+    ]
+    assert next_position == (2, 3)
+
+def test_fields_projection_keeps_every_field_in_order(index):
+    page, _ = index.get_history_page(LOT, None, "asc", 1, list(HISTORY_FIELDS), finalized_block=3)
+
+    assert page == index.get_history(LOT, finalized_block=3)[:1]
+    assert list(page[0]) == list(HISTORY_FIELDS)
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_log_scan_pages_match_index_pages(index, transfers, order):
+    # The fallback path pages decoded logs in memory; it must agree with SQL
+    decoded = [transfer for transfer in transfers if transfer["lotNumber"] == LOT]
+
+    def scan_page(after, limit):
+        return format_page(paginate_transfers(decoded, after, order, limit), limit, ["blockNumber", "to"], 3)
+
+    def index_page(after, limit):
+        return index.get_history_page(LOT, after, order, limit, ["blockNumber", "to"], finalized_block=3)
+
+    assert walk(scan_page, 2) == walk(index_page, 2)
@@ -0,0 +1,48 @@
+# test_ledger_pipeline.py
+import pandas as pd
+import pytest
+
+from ledger_pipeline import LedgerStats
+
+LEDGER = pd.DataFrame({
+    "lotNumber": ["A", "B", "A", "A", "B", "C", "B", "A"],
+    "quantity": [5, 3, 2, 4, 1, 6, 2, 1],
+    "transferDate": [
+        "2024-01-01", "2024-01-02", "2024-03-01", "2024-02-01",
+        "2024-01-03", "2024-01-04", "2024-01-05", "2024-03-02"
+    ]
+})
+
+def summarize(chunk_rows, ledger=LEDGER):
+    stats = LedgerStats(gap_days=30)
+    for start in range(0, len(ledger), chunk_rows):
+        stats.add_chunk(ledger.iloc[start:start + chunk_rows].reset_index(drop=True))
+    return stats.summary()
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 8])
+def test_out_of_order_count_does_not_depend_on_chunk_size(chunk_rows):
+    assert summarize(chunk_rows)["outOfOrderLots"] == 1
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 8])
+def test_chronological_summary_does_not_depend_on_chunk_size(chunk_rows):
+    ledger = LEDGER.sort_values("transferDate", kind="stable").reset_index(drop=True)
+
+    assert summarize(chunk_rows, ledger) == summarize(len(ledger), ledger)
+    assert summarize(chunk_rows, ledger)["outOfOrderLots"] == 0
+
+def test_backwards_step_inside_a_chunk_is_counted():
+    summary = summarize(len(LEDGER))
+
+    # Only lot A goes from March back to February
+    assert summary["outOfOrderLots"] == 1
+    assert summary["transferCount"] == 8
+    assert summary["totalUnits"] == 24
+    assert summary["largestGaps"] == [{"lotNumber": "A", "transfers": 4, "gapDays": 31.0}]
+
+def test_without_timestamps_nothing_is_out_of_order():
+    stats = LedgerStats()
+    stats.add_chunk(LEDGER.drop(columns=["transferDate"]))
+
+    summary = stats.summary()
+    assert summary["outOfOrderLots"] == 0
+    assert summary["distinctLots"] == 3
@@ -0,0 +1,56 @@
+# test_tx_submitter.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+from tx_submitter import TransactionSubmitter
+
+class FakeEth:
+    """Node whose mempool drops every transaction it is sent"""
+
+    def __init__(self):
+        self.pending_count = 5
+        self.sent_nonces = []
+
+    @property
+    async def chain_id(self):
+        return 1337
+
+    async def get_transaction_count(self, address, block_identifier):
+        return self.pending_count
+
+    async def send_raw_transaction(self, raw):
+        self.sent_nonces.append(raw["nonce"])
+        return f"tx-{raw['nonce']}".encode()
+
+    async def get_transaction_receipt(self, tx_hash):
+        raise TransactionNotFound(tx_hash)
+
+class FakeFunction:
+    async def build_transaction(self, params):
+        return params
+
+class FakeAccount:
+    address = "0x1000000000000000000000000000000000000001"
+
+    def sign_transaction(self, tx):
+        return SimpleNamespace(rawTransaction=tx, hash=f"tx-{tx['nonce']}".encode())
+
+def test_receipt_timeout_resyncs_nonce():
+    eth = FakeEth()
+    submitter = TransactionSubmitter(SimpleNamespace(eth=eth), FakeAccount(), poll_interval=0, receipt_timeout=0)
+
+    async def scenario():
+        _, receipt = await submitter.submit(FakeFunction(), {})
+        with pytest.raises(TimeExhausted):
+            await receipt
+        await submitter._watcher
+        # The dropped transaction's nonce is free again, so it is reused
+        await submitter.submit(FakeFunction(), {})
+        await submitter.stop()
+
+    asyncio.run(scenario())
+
+    assert eth.sent_nonces == [5, 5]
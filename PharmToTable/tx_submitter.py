@@ -0,0 +1,227 @@
+# tx_submitter.py
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from web3.exceptions import TransactionNotFound, TimeExhausted
+
+logger = logging.getLogger(__name__)
+
+# Substrings nodes use when a transaction's nonce no longer matches the account state
+NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "invalid nonce",
+    "replacement transaction underpriced",
+)
+
+# Substrings nodes use when this exact signed transaction is already in their mempool
+KNOWN_TX_ERRORS = (
+    "already known",
+    "known transaction",
+)
+
+def _is_nonce_error(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_ERRORS)
+
+def _is_known_transaction(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in KNOWN_TX_ERRORS)
+
+class TransactionSubmitter:
+    """
+    Owns the signer account and pipelines transactions from it
+
+    Nonces are handed out locally under a lock, so concurrent writers never
+    collide, and are resynced from the node's `pending` count after a nonce
+    error or a receipt timeout. Sending does not wait for mining: each submission gets a future
+    that a single background watcher resolves once the receipt appears.
+
+    Args:
+        w3: AsyncWeb3 instance
+        account: Local account used to sign transactions
+        max_in_flight: Maximum number of unconfirmed transactions at once
+        poll_interval: Seconds between receipt polling rounds
+        receipt_timeout: Seconds to wait for a receipt before giving up
+        max_records: Number of recent submissions kept for status lookups
+    """
+
+    def __init__(self, w3, account, max_in_flight=256, poll_interval=1.0, receipt_timeout=300.0,
+                 max_records=10000):
+        self.w3 = w3
+        self.account = account
+        self.address = account.address
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self._nonce_lock = asyncio.Lock()
+        self._next_nonce = None
+        self._chain_id = None
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending = {}
+        self._watcher = None
+        self.max_records = max_records
+        self._records = OrderedDict()
+        # jobId -> transaction hash key in _records
+        self._job_ids = {}
+
+    async def _resync_nonce(self):
+        self._next_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+
+    async def submit(self, contract_function, tx_params):
+        """
+        Sign and send a contract call without waiting for it to be mined
+
+        Args:
+            contract_function: Bound contract function, e.g. contract.functions.foo(...)
+            tx_params: Extra transaction fields such as gas and fee settings
+
+        Returns:
+            tuple: (transaction hash, future resolving to the receipt)
+        """
+        await self._slots.acquire()
+        try:
+            tx_hash = await self._send(contract_function, tx_params)
+        except Exception:
+            self._slots.release()
+            raise
+
+        receipt_future = asyncio.get_running_loop().create_future()
+        receipt_future.add_done_callback(self._on_receipt_done)
+        self._pending[tx_hash] = (receipt_future, time.monotonic())
+        self._record(tx_hash, {
+            'jobId': uuid.uuid4().hex,
+            'transactionHash': tx_hash.hex(),
+            'status': 'pending',
+            'blockNumber': None,
+            'gasUsed': None,
+            'error': None
+        })
+        self._ensure_watcher()
+        return tx_hash, receipt_future
+
+    def _on_receipt_done(self, receipt_future):
+        self._slots.release()
+        # Fire-and-forget submissions never await the future; mark its error as seen
+        if not receipt_future.cancelled():
+            receipt_future.exception()
+
+    def _record(self, tx_hash, record):
+        key = tx_hash.hex().lower()
+        self._records[key] = record
+        self._job_ids[record['jobId']] = key
+        while len(self._records) > self.max_records:
+            _, evicted = self._records.popitem(last=False)
+            self._job_ids.pop(evicted['jobId'], None)
+
+    def get_record(self, tx_id):
+        """
+        Return the tracked status of a recent submission, or None if unknown
+
+        Args:
+            tx_id: Transaction hash as a 0x-prefixed hex string, or the
+                jobId returned when it was submitted
+        """
+        key = self._job_ids.get(tx_id, tx_id.lower())
+        return self._records.get(key)
+
+    async def _send(self, contract_function, tx_params):
+        async with self._nonce_lock:
+            if self._chain_id is None:
+                self._chain_id = await self.w3.eth.chain_id
+
+            for attempt in range(2):
+                if self._next_nonce is None:
+                    await self._resync_nonce()
+                nonce = self._next_nonce
+
+                tx = await contract_function.build_transaction({
+                    **tx_params,
+                    'from': self.address,
+                    'nonce': nonce,
+                    'chainId': self._chain_id
+                })
+                signed_tx = self.account.sign_transaction(tx)
+
+                try:
+                    tx_hash = await self.w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+                except Exception as e:
+                    if _is_known_transaction(e):
+                        # The node already has this transaction (e.g. a retried send);
+                        # re-sending with another nonce would record the call twice
+                        self._next_nonce = nonce + 1
+                        return signed_tx.hash
+                    # Our view of the nonce is unreliable now; refetch it before the next send
+                    self._next_nonce = None
+                    if attempt == 0 and _is_nonce_error(e):
+                        continue
+                    raise
+
+                self._next_nonce = nonce + 1
+                return tx_hash
+
+    def _ensure_watcher(self):
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch_receipts())
+
+    async def _watch_receipts(self):
+        while self._pending:
+            await asyncio.sleep(self.poll_interval)
+            tx_hashes = list(self._pending)
+            results = await asyncio.gather(
+                *(self.w3.eth.get_transaction_receipt(tx_hash) for tx_hash in tx_hashes),
+                return_exceptions=True
+            )
+            now = time.monotonic()
+            timed_out = False
+            for tx_hash, result in zip(tx_hashes, results):
+                receipt_future, submitted_at = self._pending[tx_hash]
+                if isinstance(result, TransactionNotFound):
+                    if now - submitted_at > self.receipt_timeout:
+                        timed_out = True
+                        del self._pending[tx_hash]
+                        self._update_record(tx_hash, status='failed', error='Receipt timed out')
+                        if not receipt_future.done():
+                            receipt_future.set_exception(TimeExhausted(
+                                f"Transaction {tx_hash.hex()} not mined after {self.receipt_timeout} seconds"
+                            ))
+                elif isinstance(result, Exception):
+                    logger.warning("Receipt lookup for %s failed: %s", tx_hash.hex(), result)
+                else:
+                    del self._pending[tx_hash]
+                    self._update_record(
+                        tx_hash,
+                        status='mined' if result.status == 1 else 'failed',
+                        blockNumber=result.blockNumber,
+                        gasUsed=result.gasUsed
+                    )
+                    if not receipt_future.done():
+                        receipt_future.set_result(result)
+            if timed_out:
+                # A dropped transaction leaves its nonce unused, and every later
+                # one would queue behind the gap; refetch the pending count so
+                # the next send fills it
+                async with self._nonce_lock:
+                    self._next_nonce = None
+
+    def _update_record(self, tx_hash, **fields):
+        record = self._records.get(tx_hash.hex().lower())
+        if record is not None:
+            record.update(fields)
+
+    async def stop(self):
+        """
+        Stop watching receipts and fail any transactions still awaiting one
+        """
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        for receipt_future, _ in self._pending.values():
+            if not receipt_future.done():
+                receipt_future.cancel()
+        self._pending.clear()